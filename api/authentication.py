@@ -0,0 +1,284 @@
+import re
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.cache import LRUCache
+from api.models import UsedRefreshToken
+
+
+class TokenCache:
+    """
+    Map token keys to (user, token) pairs without touching the database.
+
+    Entries live in a bounded in-process LRU and, when a cache alias is
+    configured, in that shared cache as well. Shared entries are removed
+    on invalidation and expire after ttl. Local entries in other
+    processes cannot be reached, so they expire after the short
+    local_ttl; a revoked or deleted token stays usable on other workers
+    for at most that long.
+
+    Token keys and signed-token users live in separate namespaces, so no
+    token key can ever match a user entry.
+
+    Entries hold field values rather than model instances: the user's
+    columns except the password hash, and the token's columns. Every get
+    builds fresh instances from them, so requests never share one.
+    """
+    key_prefix = 'auth-token'
+
+    def __init__(self, maxsize=1024, ttl=60, cache_alias=None, local_ttl=5):
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self.local = LRUCache(maxsize=maxsize, ttl=local_ttl)
+
+    @property
+    def shared(self):
+        if self.cache_alias is None:
+            return None
+        return caches[self.cache_alias]
+
+    def _shared_key(self, name):
+        return f'{self.key_prefix}:{name}'
+
+    @staticmethod
+    def _user_fields():
+        return [
+            field.attname
+            for field in get_user_model()._meta.concrete_fields
+            if field.attname != 'password'
+        ]
+
+    def _pack(self, user, token=None):
+        """ Return the cache entry for a user and optional token """
+        user_values = tuple(
+            getattr(user, name) for name in self._user_fields()
+        )
+        token_values = None
+        if token is not None:
+            token_values = (token.key, token.user_id, token.created)
+        return (user.pk, user_values, token_values)
+
+    def _unpack(self, entry):
+        """ Return fresh (user, token) instances for a cache entry """
+        _, user_values, token_values = entry
+        user = get_user_model().from_db(
+            None, self._user_fields(), user_values
+        )
+        token = None
+        if token_values is not None:
+            token = Token.from_db(
+                None, ['key', 'user_id', 'created'], token_values
+            )
+            token.user = user
+        return user, token
+
+    def _get(self, name):
+        entry = self.local.get(name)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(self._shared_key(name))
+            if entry is not None:
+                self.local.set(name, entry)
+        return None if entry is None else self._unpack(entry)
+
+    def _set(self, name, entry):
+        self.local.set(name, entry)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(name), entry, self.ttl)
+
+    def get(self, key):
+        """ Return a (user, token) pair for key from the cache, or None """
+        return self._get(f'token:{key}')
+
+    def set(self, key, user, token):
+        """ Cache the user and token for key """
+        self._set(f'token:{key}', self._pack(user, token))
+
+    def get_user(self, user_id):
+        """ Return the user of a signed token from the cache, or None """
+        entry = self._get(f'user:{user_id}')
+        return None if entry is None else entry[0]
+
+    def set_user(self, user):
+        """ Cache a user looked up for a signed token """
+        self._set(f'user:{user.pk}', self._pack(user))
+
+    def invalidate(self, key):
+        """ Forget a single token """
+        self.local.delete(f'token:{key}')
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(f'token:{key}'))
+
+    def invalidate_user(self, user_id, keys=()):
+        """ Forget every token belonging to a user """
+        self.local.delete_where(lambda entry: entry[0] == user_id)
+        if self.shared is not None:
+            names = [f'user:{user_id}', *(f'token:{key}' for key in keys)]
+            self.shared.delete_many(
+                [self._shared_key(name) for name in names]
+            )
+
+    def clear(self):
+        """ Forget every token held in this process """
+        self.local.clear()
+
+
+def _build_token_cache():
+    options = getattr(settings, 'AUTH_TOKEN_CACHE', {})
+    return TokenCache(
+        maxsize=options.get('MAXSIZE', 1024),
+        ttl=options.get('TTL', 60),
+        cache_alias=options.get('CACHE_ALIAS'),
+        local_ttl=options.get('LOCAL_TTL', 5),
+    )
+
+
+token_cache = _build_token_cache()
+
+# Keys as generated by rest_framework.authtoken's Token.generate_key
+TOKEN_KEY_RE = re.compile(r'[0-9a-f]{40}')
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for TokenAuthentication that serves repeat
+    requests from the token cache instead of querying the token table
+    """
+    def authenticate_credentials(self, key):
+        if not TOKEN_KEY_RE.fullmatch(key):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        entry = token_cache.get(key)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+        else:
+            user, token = entry
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.')
+                )
+        return (user, token)
+
+
+ACCESS_TOKEN_SALT = 'api.authentication.access'
+REFRESH_TOKEN_SALT = 'api.authentication.refresh'
+
+
+def _signed_token_max_age(name):
+    options = getattr(settings, 'SIGNED_TOKEN', {})
+    defaults = {'ACCESS_TTL': 300, 'REFRESH_TTL': 60 * 60 * 24 * 14}
+    return options.get(name, defaults[name])
+
+
+def sign_token(user, salt, *claims):
+    """ Return a token signing the user id, revocation counter and claims """
+    signer = signing.TimestampSigner(salt=salt)
+    return signer.sign(
+        ':'.join([str(user.pk), str(user.token_version), *claims])
+    )
+
+
+def unsign_token(token, salt, max_age, claims=0):
+    """ Verify a signed token and return (user id, counter, *claims) """
+    value = signing.TimestampSigner(salt=salt).unsign(token, max_age=max_age)
+    parts = value.split(':')
+    if len(parts) != 2 + claims:
+        raise signing.BadSignature('Malformed token payload')
+    try:
+        return (int(parts[0]), int(parts[1]), *parts[2:])
+    except ValueError:
+        raise signing.BadSignature('Malformed token payload')
+
+
+def issue_signed_tokens(user):
+    """
+    Return a new access/refresh token pair for user. Each refresh token
+    carries a unique id so it can be exchanged only once.
+    """
+    return {
+        'access': sign_token(user, ACCESS_TOKEN_SALT),
+        'refresh': sign_token(user, REFRESH_TOKEN_SALT, secrets.token_hex(16)),
+    }
+
+
+def verify_refresh_token(token):
+    """
+    Return the active user a refresh token was issued to and mark the
+    token used, so the pair issued for it replaces it
+    """
+    max_age = _signed_token_max_age('REFRESH_TTL')
+    try:
+        user_id, version, jti = unsign_token(
+            token, REFRESH_TOKEN_SALT, max_age, claims=1
+        )
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed(_('Refresh token expired.'))
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed(_('Invalid refresh token.'))
+
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is None or not user.is_active or user.token_version != version:
+        raise exceptions.AuthenticationFailed(_('Refresh token revoked.'))
+
+    now = timezone.now()
+    UsedRefreshToken.objects.filter(expires_at__lt=now).delete()
+    try:
+        with transaction.atomic():
+            UsedRefreshToken.objects.create(
+                jti=jti, expires_at=now + timedelta(seconds=max_age)
+            )
+    except IntegrityError:
+        raise exceptions.AuthenticationFailed(_('Refresh token already used.'))
+    return user
+
+
+def revoke_signed_tokens(user):
+    """ Invalidate every signed token issued to user so far """
+    user.token_version = F('token_version') + 1
+    user.save(update_fields=['token_version'])
+    user.refresh_from_db(fields=['token_version'])
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """
+    Authenticate short-lived HMAC signed access tokens sent as
+    "Authorization: Bearer <token>". Verifying a token is a hash
+    computation; the user is served from the token cache.
+    """
+    keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        try:
+            user_id, version = unsign_token(
+                key, ACCESS_TOKEN_SALT, _signed_token_max_age('ACCESS_TTL')
+            )
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed(_('Token expired.'))
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        user = token_cache.get_user(user_id)
+        if user is None:
+            user = get_user_model().objects.filter(pk=user_id).first()
+            if user is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            token_cache.set_user(user)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        if user.token_version != version:
+            raise exceptions.AuthenticationFailed(_('Token revoked.'))
+        return (user, key)
@@ -0,0 +1,348 @@
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ModelSerializer
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    issue_signed_tokens,
+    token_cache,
+)
+from api.models import Business, Tag, Task
+from api.renderers import (
+    MessagePackRenderer,
+    ORJSONRenderer,
+    msgpack,
+    orjson,
+)
+from api.serializers import UserSerializer
+from business import images
+from business.cache import representation_cache
+from business.export import iter_business_graph
+from business.fast import AttrFastSerializer, BusinessFastSerializer
+from business.filters import filter_assigned, filter_min_usage
+from business.serializers import (
+    BusinessDetailSerializer,
+    BusinessSerializer,
+    TagSerializer,
+)
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name, extra=None):
+    """
+    Register a benchmark function under name. Rows it returns may carry
+    a fourth value, printed in a column labelled extra.
+    """
+    def decorator(func):
+        func.extra_column = extra
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def measure(func, iterations):
+    """ Run func repeatedly and return (seconds, queries) per iteration """
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+    return elapsed / iterations, len(queries) / iterations
+
+
+def bench_user(email='bench@email.com'):
+    """ Create a throwaway user for a benchmark run """
+    return get_user_model().objects.create_user(
+        email=email, name='bench', password='Password123'
+    )
+
+
+def seed_graph(user, tags=500, businesses=5000, fanout=5, seed=0):
+    """ Bulk create tags, tasks and businesses linked at random for user """
+    rng = random.Random(seed)
+    for model in (Tag, Task):
+        model.objects.bulk_create(
+            [model(user=user, name=f'{model.__name__} {i}') for i in range(tags)],
+            batch_size=1000
+        )
+    Business.objects.bulk_create(
+        [Business(user=user, title=f'business {i}') for i in range(businesses)],
+        batch_size=1000
+    )
+    business_ids = list(
+        Business.objects.filter(user=user).values_list('id', flat=True)
+    )
+    for field, model in (('tag', Tag), ('task', Task)):
+        ids = list(model.objects.filter(user=user).values_list('id', flat=True))
+        through = Business._meta.get_field(field).remote_field.through
+        through.objects.bulk_create([
+            through(business_id=business_id, **{f'{field}_id': pk})
+            for business_id in business_ids
+            for pk in rng.sample(ids, min(fanout, len(ids)))
+        ], batch_size=1000)
+
+
+@benchmark('auth')
+def auth_benchmark(iterations):
+    """ Compare queries and time per request for token authentication """
+    user = bench_user()
+    token = Token.objects.create(user=user)
+    request = APIRequestFactory().get(
+        '/me/', HTTP_AUTHORIZATION=f'Token {token.key}'
+    )
+    signed = issue_signed_tokens(user)['access']
+    signed_request = APIRequestFactory().get(
+        '/me/', HTTP_AUTHORIZATION=f'Bearer {signed}'
+    )
+    token_cache.clear()
+    rows = []
+    variants = (
+        (TokenAuthentication, request),
+        (CachedTokenAuthentication, request),
+        (SignedTokenAuthentication, signed_request),
+    )
+    for auth_class, auth_request in variants:
+        auth = auth_class()
+        seconds, queries = measure(
+            lambda: auth.authenticate(auth_request), iterations
+        )
+        rows.append((auth_class.__name__, seconds, queries))
+    return rows
+
+
+@benchmark('attr_filters')
+def attr_filters_benchmark(iterations):
+    """ Compare assigned_only as JOIN + DISTINCT against an EXISTS semi-join """
+    user = bench_user()
+    seed_graph(user, tags=2000, businesses=5000, fanout=10)
+    tags = Tag.objects.filter(user=user)
+    variants = (
+        ('join + distinct', tags.filter(business__isnull=False).distinct()),
+        ('exists', filter_assigned(tags, 'tag')),
+        ('join + count min_usage=30', tags.annotate(
+            usage=Count('business')).filter(usage__gte=30)),
+        ('subquery min_usage=30', filter_min_usage(tags, 'tag', 30)),
+    )
+    rows = []
+    for name, queryset in variants:
+        queryset = queryset.order_by('-name')
+        seconds, queries = measure(lambda: list(queryset.all()), iterations)
+        rows.append((name, seconds, queries))
+    return rows
+
+
+@benchmark('serializers', extra='rows/s')
+def serializers_benchmark(iterations):
+    """ Compare ModelSerializer lists against the values() fast path """
+    user = bench_user()
+    seed_graph(user, tags=1000, businesses=1000, fanout=5)
+    tags = Tag.objects.filter(user=user).order_by('-name', 'id')
+    businesses = Business.objects.filter(user=user).order_by('-id')
+    def cold_businesses():
+        # Serialize cold so the representation cache does not hide the
+        # cost, without touching the shared caches of a live deployment
+        with override_settings(
+            CACHES={**settings.CACHES, 'benchmark-cold': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            }},
+            REPRESENTATION_CACHE={'CACHE_ALIAS': 'benchmark-cold'},
+        ):
+            return BusinessSerializer(businesses.all(), many=True).data
+
+    variants = (
+        ('tags ModelSerializer', 1000,
+         lambda: TagSerializer(tags.all(), many=True).data),
+        ('tags values()', 1000,
+         lambda: AttrFastSerializer().represent(
+             tags.values(*AttrFastSerializer.fields))),
+        ('business ModelSerializer', 1000, cold_businesses),
+        ('business values()', 1000,
+         lambda: BusinessFastSerializer().represent(
+             businesses.values(*BusinessFastSerializer.fields))),
+    )
+    rows = []
+    for name, count, func in variants:
+        seconds, queries = measure(func, iterations)
+        rows.append((name, seconds, queries, count / seconds))
+    return rows
+
+
+@benchmark('serializer_fields')
+def serializer_fields_benchmark(iterations):
+    """ Compare building serializer fields from scratch against the cache """
+    variants = (
+        ('me/', UserSerializer),
+        ('tags/', TagSerializer),
+        ('business/', BusinessSerializer),
+        ('business/<id>/', BusinessDetailSerializer),
+    )
+    rows = []
+    for endpoint, serializer_class in variants:
+        serializer = serializer_class()
+        seconds, queries = measure(
+            lambda: ModelSerializer.get_fields(serializer), iterations
+        )
+        rows.append((f'{endpoint} introspected', seconds, queries))
+        seconds, queries = measure(serializer.get_fields, iterations)
+        rows.append((f'{endpoint} cached', seconds, queries))
+    return rows
+
+
+@benchmark('renderers', extra='bytes')
+def renderers_benchmark(iterations):
+    """ Compare encode time and payload size of a large business list """
+    user = bench_user()
+    seed_graph(user, tags=500, businesses=5000, fanout=5)
+    data = BusinessFastSerializer().represent(
+        Business.objects.filter(user=user).order_by('-id')
+        .values(*BusinessFastSerializer.fields)
+    )
+    variants = [('json (stdlib)', JSONRenderer())]
+    if orjson is not None:
+        variants.append(('json (orjson)', ORJSONRenderer()))
+    if msgpack is not None:
+        variants.append(('msgpack', MessagePackRenderer()))
+
+    rows = []
+    for name, renderer in variants:
+        seconds, queries = measure(lambda: renderer.render(data), iterations)
+        rows.append((name, seconds, queries, len(renderer.render(data))))
+    return rows
+
+
+@benchmark('export', extra='peak KiB')
+def export_benchmark(iterations):
+    """
+    Show the NDJSON export's peak memory stays flat as rows grow. With
+    DEBUG on the peak also includes the connection's query log.
+    """
+    rows = []
+    for count in (5000, 50000):
+        user = bench_user(f'export{count}@email.com')
+        seed_graph(user, tags=200, businesses=count, fanout=5)
+        businesses = Business.objects.filter(user=user)
+
+        def drain():
+            for _ in iter_business_graph(user, businesses):
+                pass
+
+        seconds, queries = measure(drain, iterations)
+        tracemalloc.start()
+        drain()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows.append((f'{count} businesses', seconds, queries, peak / 1024))
+    return rows
+
+
+@benchmark('images', extra='images/s')
+def images_benchmark(iterations):
+    """
+    Compare the request thread cost of decoding uploads with the header
+    check, and the throughput of processing uploads on the image pool
+    """
+    buffer = io.BytesIO()
+    Image.effect_noise((3000, 2000), 40).convert('RGB').save(
+        buffer, format='JPEG', quality=90
+    )
+    data = buffer.getvalue()
+
+    def upload():
+        return SimpleUploadedFile('photo.jpg', data)
+
+    rows = []
+    request_variants = (
+        ('request: ImageField verify',
+         lambda: serializers.ImageField().run_validation(upload())),
+        ('request: header check', lambda: images.identify(upload())),
+    )
+    for name, func in request_variants:
+        seconds, queries = measure(func, iterations)
+        rows.append((name, seconds, queries, 1 / seconds))
+
+    size = images.pipeline_options()['THUMBNAIL_SIZE']
+    batch = 8
+    for workers in (1, 2, 4):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            def process_batch():
+                list(pool.map(
+                    lambda _: images.render(io.BytesIO(data), size),
+                    range(batch)
+                ))
+            seconds, queries = measure(process_batch, max(1, iterations // 10))
+        rows.append((f'pool: {workers} workers x {batch} uploads',
+                     seconds, queries, batch / seconds))
+    return rows
+
+
+@benchmark('image_dedup', extra='disk KiB')
+def image_dedup_benchmark(iterations):
+    """
+    Compare storing one logo per business under fresh names with storing
+    it once per content hash, by upload time and disk used
+    """
+    buffer = io.BytesIO()
+    Image.effect_noise((800, 600), 40).convert('RGB').save(
+        buffer, format='JPEG', quality=90
+    )
+    data = buffer.getvalue()
+    user = bench_user()
+    businesses = [
+        Business.objects.create(user=user, title=f'business {i}')
+        for i in range(iterations)
+    ]
+
+    def disk_usage(root):
+        return sum(
+            os.path.getsize(os.path.join(directory, name))
+            for directory, _, names in os.walk(root) for name in names
+        )
+
+    variants = (
+        ('uuid per upload', lambda business, upload: (
+            business.image.save(upload.name, upload),
+            images.render(io.BytesIO(data),
+                          images.pipeline_options()['THUMBNAIL_SIZE']),
+        )),
+        ('content addressed', images.store_image),
+    )
+    rows = []
+    for name, store in variants:
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root,
+                                   IMAGE_PIPELINE={'EAGER': True}):
+                uploads = iter(businesses)
+
+                def upload():
+                    store(next(uploads),
+                          SimpleUploadedFile('logo.jpg', data))
+
+                seconds, queries = measure(upload, iterations)
+                rows.append((name, seconds, queries,
+                             disk_usage(media_root) / 1024))
+        finally:
+            shutil.rmtree(media_root, True)
+    return rows
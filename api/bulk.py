@@ -0,0 +1,39 @@
+from django.db import connections, models, router, transaction
+
+BATCH_SIZE = 1000
+
+
+def bulk_insert(model, objs, batch_size=BATCH_SIZE):
+    """
+    Insert objs with bulk_create and return them with primary keys set.
+
+    Backends that cannot return ids from a multi-row INSERT (SQLite on
+    Django < 4) read them back with one query in the same transaction.
+    SQLite holds the write lock from the first INSERT until commit and
+    hands out increasing AUTOINCREMENT ids, so the new rows are the
+    len(objs) highest ids, in insertion order.
+    """
+    alias = router.db_for_write(model)
+    connection = connections[alias]
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs, batch_size=batch_size)
+
+    pk = model._meta.pk
+    if connection.vendor != 'sqlite' or \
+            not isinstance(pk, models.AutoField) or \
+            any(obj.pk is not None for obj in objs):
+        for obj in objs:
+            obj.save(force_insert=True)
+        return objs
+
+    with transaction.atomic(using=alias):
+        model.objects.using(alias).bulk_create(objs, batch_size=batch_size)
+        pks = list(
+            model.objects.using(alias).order_by('-pk')
+            .values_list('pk', flat=True)[:len(objs)]
+        )
+    for obj, obj_pk in zip(objs, reversed(pks)):
+        setattr(obj, pk.attname, obj_pk)
+        obj._state.adding = False
+        obj._state.db = alias
+    return objs
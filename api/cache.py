@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """ Thread safe, size bounded in-process cache with a per entry TTL """
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """ Return the cached value for key, or default if missing/expired """
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """ Store a value, evicting the least recently used entries """
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """ Remove key from the cache if present """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """ Remove every entry whose value matches predicate """
+        with self._lock:
+            stale = [
+                key for key, (_, value) in self._data.items()
+                if predicate(value)
+            ]
+            for key in stale:
+                del self._data[key]
+
+    def clear(self):
+        """ Remove every entry """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
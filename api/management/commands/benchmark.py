@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    ''' Django command to run a performance benchmark '''
+    help = 'Run a benchmark inside a transaction that is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS))
+        parser.add_argument('--iterations', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        func = BENCHMARKS[options['name']]
+        with transaction.atomic():
+            rows = func(options['iterations'])
+            transaction.set_rollback(True)
+
+        header = f'{"variant":<32}{"ms/op":>12}{"queries/op":>12}'
+        if func.extra_column:
+            header += f'{func.extra_column:>14}'
+        self.stdout.write(header)
+        for name, seconds, queries, *extra in rows:
+            line = f'{name:<32}{seconds * 1000:>12.4f}{queries:>12.2f}'
+            for value in extra:
+                line += f'{value:>14.0f}'
+            self.stdout.write(line)
@@ -0,0 +1,79 @@
+import os
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import UploadSession
+from business.uploads import discard_session_file, upload_options
+
+
+class Command(BaseCommand):
+    '''
+    Django command to delete resumable uploads nobody finished. Sessions
+    that received no chunk for --max-age seconds are deleted with their
+    files, as are chunk files whose session is gone, e.g. because its
+    business was deleted.
+    '''
+    help = 'Delete abandoned resumable upload sessions and their chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int,
+            help='Idle seconds before a session is abandoned '
+                 '(default: IMAGE_UPLOADS["MAX_AGE"])'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        uploads = upload_options()
+        max_age = options['max_age']
+        if max_age is None:
+            max_age = uploads['MAX_AGE']
+        cutoff = timezone.now() - timedelta(seconds=max_age)
+
+        stale = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+        if not options['dry_run']:
+            for session in stale:
+                discard_session_file(session)
+            UploadSession.objects.filter(
+                pk__in=[session.pk for session in stale]
+            ).delete()
+
+        orphans = self._orphans(uploads['DIR'], time.time() - max_age)
+        if not options['dry_run']:
+            for path in orphans:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(stale)} sessions and {len(orphans)} orphaned files'
+        ))
+
+    def _orphans(self, directory, before):
+        """ Return old chunk files without a session """
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        candidates = {}
+        for name in names:
+            path = os.path.join(directory, name)
+            stem, ext = os.path.splitext(name)
+            try:
+                uuid.UUID(stem)
+                if ext == '.part' and os.path.getmtime(path) < before:
+                    candidates[stem] = path
+            except (ValueError, FileNotFoundError):
+                continue
+        live = {
+            str(pk) for pk in UploadSession.objects.filter(
+                pk__in=list(candidates)
+            ).values_list('pk', flat=True)
+        }
+        return [path for stem, path in candidates.items() if stem not in live]
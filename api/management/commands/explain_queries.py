@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import Business
+from business import views
+
+
+class Command(BaseCommand):
+    ''' Django command to print the query plans of the business viewsets '''
+    help = 'Print EXPLAIN output for each business api list query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='User whose data is queried')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+
+        tag_ids = ','.join(map(str, Business.tag.through.objects.filter(
+            business__user=user
+        ).values_list('tag_id', flat=True)[:3])) or '0'
+        task_ids = ','.join(map(str, Business.task.through.objects.filter(
+            business__user=user
+        ).values_list('task_id', flat=True)[:3])) or '0'
+
+        cases = [
+            ('tags', views.TagViewSet, {}),
+            ('tags assigned_only', views.TagViewSet, {'assigned_only': 1}),
+            ('tasks', views.TaskViewSet, {}),
+            ('tasks assigned_only', views.TaskViewSet, {'assigned_only': 1}),
+            ('business', views.BusinessViewSet, {}),
+            ('business by tag', views.BusinessViewSet, {'tag': tag_ids}),
+            ('business by task', views.BusinessViewSet, {'task': task_ids}),
+        ]
+        for name, viewset, params in cases:
+            queryset = self._list_queryset(viewset, user, params)
+            self.stdout.write(self.style.SUCCESS(f'== {name}'))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain())
+            self.stdout.write('')
+
+    def _list_queryset(self, viewset, user, params):
+        """ Return the first page queryset a list request would run """
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+        view = viewset(request=request, action='list', format_kwarg=None)
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = view.paginator
+        queryset = queryset.order_by(*paginator.ordering)
+        return queryset[:paginator.page_size]
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.models import Business, ImageBlob
+
+
+class Command(BaseCommand):
+    '''
+    Django command to delete image blobs no business references anymore.
+
+    Blobs younger than --min-age are kept, since an upload stores its blob
+    before pointing the business at it. Each batch is locked, re-checked
+    and deleted in its own transaction; the files are removed once it
+    commits.
+    '''
+    help = 'Delete unreferenced image blobs and their files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Seconds a blob must exist before it can be collected'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Recompute reference counts from the businesses first'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['recount'] and not options['dry_run']:
+            fixed = self._recount()
+            self.stdout.write(f'Corrected {fixed} reference counts')
+
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        candidates = ImageBlob.objects.filter(
+            refcount__lte=0,
+            businesses__isnull=True,
+            created_at__lt=cutoff,
+        ).values_list('pk', flat=True).iterator()
+
+        deleted = freed = 0
+        while True:
+            batch = list(islice(candidates, options['batch_size']))
+            if not batch:
+                break
+            if options['dry_run']:
+                blobs = ImageBlob.objects.filter(pk__in=batch)
+                deleted += len(batch)
+                freed += sum(blob.size for blob in blobs)
+                continue
+            count, size = self._delete(batch)
+            deleted += count
+            freed += size
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} blobs ({freed / 1024:.0f} KiB of uploads)'
+        ))
+
+    def _delete(self, pks):
+        """ Delete the blobs of a batch still unreferenced, with files """
+        with transaction.atomic():
+            blobs = list(
+                ImageBlob.objects.select_for_update()
+                .filter(pk__in=pks, refcount__lte=0, businesses__isnull=True)
+            )
+            names = [
+                name for blob in blobs
+                for name in (blob.image.name, blob.thumbnail.name) if name
+            ]
+            ImageBlob.objects.filter(pk__in=[blob.pk for blob in blobs]) \
+                .delete()
+            storage = ImageBlob._meta.get_field('image').storage
+            transaction.on_commit(
+                lambda: [storage.delete(name) for name in names]
+            )
+        return len(blobs), sum(blob.size for blob in blobs)
+
+    def _recount(self):
+        """ Set every blob's reference count to its number of businesses """
+        references = Business.objects.filter(
+            image_blob=OuterRef('pk')
+        ).order_by().values('image_blob').annotate(
+            count=Count('pk')
+        ).values('count')
+        actual = Coalesce(Subquery(references), 0)
+        return ImageBlob.objects.exclude(refcount=actual) \
+            .update(refcount=actual)
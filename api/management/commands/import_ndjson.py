@@ -0,0 +1,206 @@
+import gzip
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.bulk import BATCH_SIZE, bulk_insert
+from api.models import Business, ImportCheckpoint, Tag, Task
+from business.cache import representation_cache
+from business.versions import bump_for_model
+
+ATTR_MODELS = {'tag': Tag, 'task': Task}
+
+
+class Command(BaseCommand):
+    '''
+    Django command to load tags, tasks and businesses from an NDJSON file.
+
+    Every line is an object with a "type" of "tag", "task" or "business",
+    in the format written by the business export. Businesses reference
+    tags and tasks by name, or by the "id" an earlier line of the file
+    gave them. Each batch is written in its own transaction together with
+    a checkpoint row for the user, so an interrupted import resumes where
+    the last committed batch ended without replaying it.
+    '''
+    help = 'Import tags, tasks and businesses for a user from NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='User the rows are imported for')
+        parser.add_argument('path', help='NDJSON file, optionally gzipped')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help='Checkpoint name (default: absolute path of the file)'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore an existing checkpoint and start from the top'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            self.user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        path = options['path']
+        # Checkpoints belong to the user, so importing the same file for
+        # someone else never resumes from another user's progress
+        source = options['checkpoint'] or os.path.abspath(path)
+        if options['restart']:
+            ImportCheckpoint.objects.filter(
+                user=self.user, source=source
+            ).delete()
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            user=self.user, source=source
+        )
+        if checkpoint.line:
+            self.stdout.write(f'Resuming after line {checkpoint.line}')
+
+        # name -> id of the user's tags/tasks, and file id -> database id
+        self.names = {
+            field: dict(
+                model.objects.filter(user=self.user)
+                .order_by('-id').values_list('name', 'id')
+            )
+            for field, model in ATTR_MODELS.items()
+        }
+        self.file_ids = {
+            field: {
+                int(k): v
+                for k, v in checkpoint.file_ids.get(field, {}).items()
+            }
+            for field in ATTR_MODELS
+        }
+
+        start = time.perf_counter()
+        imported = 0
+        line_number = checkpoint.line
+        with self._open(path) as f:
+            lines = islice(f, line_number, None)
+            while True:
+                batch = list(islice(lines, options['batch_size']))
+                if not batch:
+                    break
+                records = [
+                    self._parse(line_number + index + 1, line)
+                    for index, line in enumerate(batch)
+                    if line.strip()
+                ]
+                line_number += len(batch)
+                with transaction.atomic():
+                    self._write(records)
+                    checkpoint.line = line_number
+                    checkpoint.file_ids = self.file_ids
+                    checkpoint.save(update_fields=['line', 'file_ids',
+                                                   'updated_at'])
+                imported += len(batch)
+
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'{line_number} lines, {imported / elapsed:.0f} rows/s'
+                )
+
+        checkpoint.delete()
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} rows'))
+
+    def _open(self, path):
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8')
+        return open(path, encoding='utf-8')
+
+    def _parse(self, line_number, line):
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise CommandError(f'Line {line_number}: {exc}')
+        if not isinstance(record, dict) or \
+                record.get('type') not in ('tag', 'task', 'business'):
+            raise CommandError(f'Line {line_number}: unknown record type')
+        required = 'title' if record['type'] == 'business' else 'name'
+        if not isinstance(record.get(required), str):
+            raise CommandError(f'Line {line_number}: {required} is required')
+        if record['type'] == 'business':
+            for field in ATTR_MODELS:
+                if not isinstance(record.get(field, []), list):
+                    raise CommandError(
+                        f'Line {line_number}: {field} must be a list'
+                    )
+        elif 'id' in record and type(record['id']) is not int:
+            # String references are names, so only integer ids resolve
+            raise CommandError(f'Line {line_number}: id must be an integer')
+        record['line'] = line_number
+        return record
+
+    def _resolve(self, field, ref, line_number):
+        """ Return the database id of a tag/task reference """
+        if isinstance(ref, str):
+            return self.names[field][ref]
+        try:
+            return self.file_ids[field][ref]
+        except (KeyError, TypeError):
+            raise CommandError(
+                f'Line {line_number}: unknown {field} id {ref!r}'
+            )
+
+    def _write(self, records):
+        """ Insert one batch of records """
+        for field, model in ATTR_MODELS.items():
+            # Tags/tasks defined in the batch or referenced by name
+            wanted = []
+            for record in records:
+                if record['type'] == field:
+                    wanted.append(record['name'])
+                elif record['type'] == 'business':
+                    wanted.extend(
+                        ref for ref in record.get(field, [])
+                        if isinstance(ref, str)
+                    )
+            new = list(dict.fromkeys(
+                name for name in wanted if name not in self.names[field]
+            ))
+            if new:
+                objs = bulk_insert(
+                    model, [model(user=self.user, name=name) for name in new]
+                )
+                self.names[field].update((obj.name, obj.id) for obj in objs)
+                bump_for_model(model, self.user.id)
+
+            for record in records:
+                if record['type'] == field and 'id' in record:
+                    self.file_ids[field][record['id']] = \
+                        self.names[field][record['name']]
+
+        businesses = [r for r in records if r['type'] == 'business']
+        if not businesses:
+            return
+        links = {
+            field: [
+                list(dict.fromkeys(
+                    self._resolve(field, ref, record['line'])
+                    for ref in record.get(field, [])
+                ))
+                for record in businesses
+            ]
+            for field in ATTR_MODELS
+        }
+        objs = bulk_insert(Business, [
+            Business(user=self.user, title=record['title'])
+            for record in businesses
+        ])
+        for field in ATTR_MODELS:
+            through = Business._meta.get_field(field).remote_field.through
+            through.objects.bulk_create([
+                through(business_id=obj.id, **{f'{field}_id': pk})
+                for obj, pks in zip(objs, links[field])
+                for pk in pks
+            ], batch_size=BATCH_SIZE)
+        bump_for_model(Business, self.user.id)
+        representation_cache.bump(Business, [obj.pk for obj in objs])
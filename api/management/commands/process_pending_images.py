@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import ImageBlob
+from business import images
+
+
+class Command(BaseCommand):
+    '''
+    Django command to process image blobs left pending. The in-process
+    image pool loses its queue when a server process exits and turns jobs
+    away once IMAGE_PIPELINE["MAX_QUEUE"] are waiting, so such blobs are
+    processed here. Blobs younger than --min-age are skipped, as a pool
+    may still be working on them.
+    '''
+    help = 'Process image blobs whose background job never ran'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=600,
+            help='Seconds a blob must have been pending before it is taken'
+        )
+        parser.add_argument('--limit', type=int)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        pending = ImageBlob.objects.filter(
+            status=ImageBlob.IMAGE_PENDING,
+            created_at__lt=cutoff,
+        ).order_by('created_at').values_list('pk', flat=True)
+        if options['limit'] is not None:
+            pending = pending[:options['limit']]
+        pending = list(pending)
+
+        if not options['dry_run']:
+            for blob_id in pending:
+                images.process_blob(blob_id)
+
+        verb = 'Would process' if options['dry_run'] else 'Processed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(pending)} pending images'
+        ))
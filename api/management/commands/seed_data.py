@@ -0,0 +1,178 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from api.models import Business, Tag, Task
+
+DISTRIBUTIONS = ('fixed', 'uniform', 'pareto')
+
+# Shape of the pareto distribution; heavy tailed but with a finite mean
+PARETO_ALPHA = 1.5
+
+
+class BatchWriter:
+    """ Buffer unsaved objects and bulk_create them batch_size at a time """
+    def __init__(self, model, batch_size):
+        self.model = model
+        self.batch_size = batch_size
+        self.buffer = []
+        self.count = 0
+
+    def add(self, obj):
+        self.buffer.append(obj)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.model.objects.bulk_create(self.buffer)
+            self.count += len(self.buffer)
+            self.buffer = []
+
+
+class LinkWriter(BatchWriter):
+    """
+    Buffer (business id, related id) pairs and insert them into an M2M
+    through table with executemany, skipping model instantiation
+    """
+    def __init__(self, field, batch_size):
+        through = Business._meta.get_field(field).remote_field.through
+        super().__init__(through, batch_size)
+        qn = connection.ops.quote_name
+        self.sql = (
+            f'INSERT INTO {qn(through._meta.db_table)} '
+            f'({qn("business_id")}, {qn(f"{field}_id")}) VALUES (%s, %s)'
+        )
+
+    def flush(self):
+        if self.buffer:
+            with connection.cursor() as cursor:
+                cursor.executemany(self.sql, self.buffer)
+            self.count += len(self.buffer)
+            self.buffer = []
+
+
+class Command(BaseCommand):
+    '''
+    Django command to generate users with tags, tasks and businesses for
+    load testing. Primary keys are assigned up front so rows never have
+    to be read back, links are written to the through tables directly and
+    every user shares one pre-hashed password. The same seed on the same
+    database produces the same data.
+    '''
+    help = 'Seed the database with synthetic users and business graphs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Mean tags per user')
+        parser.add_argument('--tasks', type=int, default=20,
+                            help='Mean tasks per user')
+        parser.add_argument('--businesses', type=int, default=100,
+                            help='Mean businesses per user')
+        parser.add_argument('--fanout', type=int, default=3,
+                            help='Mean tags and tasks per business')
+        parser.add_argument('--distribution', choices=DISTRIBUTIONS,
+                            default='uniform')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='Password123')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.distribution = options['distribution']
+        batch_size = options['batch_size']
+        User = get_user_model()
+        writers = {
+            model: BatchWriter(model, batch_size)
+            for model in (User, Tag, Task, Business)
+        }
+        links = {
+            field: LinkWriter(field, batch_size) for field in ('tag', 'task')
+        }
+        password = make_password(options['password'])
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            next_pk = {
+                model: self._next_pk(model)
+                for model in (User, Tag, Task, Business)
+            }
+            for _ in range(options['users']):
+                user_id = next_pk[User]
+                next_pk[User] += 1
+                writers[User].add(User(
+                    id=user_id,
+                    email=f'seed{user_id}@example.com',
+                    name=f'Seed user {user_id}',
+                    password=password,
+                ))
+
+                pks = {}
+                for model, field in ((Tag, 'tags'), (Task, 'tasks')):
+                    count = self._draw(options[field])
+                    first = next_pk[model]
+                    next_pk[model] += count
+                    pks[model] = range(first, first + count)
+                    for index, pk in enumerate(pks[model]):
+                        writers[model].add(model(
+                            id=pk, user_id=user_id,
+                            name=f'{model.__name__} {index}'
+                        ))
+
+                for index in range(self._draw(options['businesses'])):
+                    business_id = next_pk[Business]
+                    next_pk[Business] += 1
+                    writers[Business].add(Business(
+                        id=business_id, user_id=user_id,
+                        title=f'Business {index}'
+                    ))
+                    for field, model in (('tag', Tag), ('task', Task)):
+                        fanout = min(
+                            self._draw(options['fanout']), len(pks[model])
+                        )
+                        for pk in self.rng.sample(pks[model], fanout):
+                            links[field].add((business_id, pk))
+
+            # Foreign keys are checked at commit, so flush order is free
+            all_writers = [*writers.values(), *links.values()]
+            for writer in all_writers:
+                writer.flush()
+            self._reset_sequences(writer.model for writer in all_writers)
+
+        elapsed = time.perf_counter() - start
+        rows = sum(writer.count for writer in all_writers)
+        for writer in all_writers:
+            self.stdout.write(f'{writer.model._meta.label}: {writer.count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {rows} rows in {elapsed:.1f}s '
+            f'({rows / elapsed:.0f} rows/s)'
+        ))
+
+    def _draw(self, mean):
+        """ Draw a count with the configured distribution around mean """
+        if mean <= 0:
+            return 0
+        if self.distribution == 'fixed':
+            return mean
+        if self.distribution == 'uniform':
+            return self.rng.randint(0, 2 * mean)
+        scale = mean * (PARETO_ALPHA - 1) / PARETO_ALPHA
+        return min(int(scale * self.rng.paretovariate(PARETO_ALPHA)),
+                   mean * 100)
+
+    def _next_pk(self, model):
+        return (model.objects.aggregate(pk=Max('pk'))['pk'] or 0) + 1
+
+    def _reset_sequences(self, models):
+        """ Move the id sequences past the explicitly assigned keys """
+        statements = connection.ops.sequence_reset_sql(no_style(), list(models))
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
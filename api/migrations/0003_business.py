@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:31
+
+import api.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_auto_20210814_0839'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Business',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('image', models.ImageField(null=True, upload_to=api.models.business_image_file_path)),
+                ('tag', models.ManyToManyField(to='api.Tag')),
+                ('task', models.ManyToManyField(to='api.Task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_userprofile_token_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-name', 'id'], name='api_tag_user_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', '-name', 'id'], name='api_task_user_name_id_idx'),
+        ),
+    ]
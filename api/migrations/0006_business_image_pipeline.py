@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:53
+
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to=api.models.business_thumbnail_file_path),
+        ),
+    ]
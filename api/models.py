@@ -15,6 +15,21 @@ def business_image_file_path(instance, filename):
     return os.path.join('uploads/business/', filename)
 
 
+def business_thumbnail_file_path(instance, filename):
+    """ Generate file path for new business thumbnail """
+    ext = filename.split('.')[-1]
+    filename = f'{uuid.uuid4()}.{ext}'
+    return os.path.join('uploads/business/thumbnails/', filename)
+
+
+def image_blob_file_path(instance, filename):
+    """ Generate the content addressed file path of an uploaded image """
+    ext = filename.split('.')[-1].lower()
+    digest = instance.digest
+    return os.path.join('uploads/blobs/originals/', digest[:2],
+                        f'{digest}.{ext}')
+
+
 class UserProfileManager(BaseUserManager):
     """ Manager for user profile """
     def create_user(self, email, name, password=None):
@@ -46,6 +61,7 @@ class UserProfile(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    token_version = models.PositiveIntegerField(default=0)
 
     objects = UserProfileManager()
 
@@ -65,6 +81,15 @@ class UserProfile(AbstractBaseUser, PermissionsMixin):
         return self.email
 
 
+class UsedRefreshToken(models.Model):
+    """ Refresh token already exchanged, kept until it would have expired """
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
+
+
 class Tag(models.Model):
     """ Tag to be used for business department """
     name = models.CharField(max_length=255)
@@ -73,6 +98,14 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name', 'id'],
+                name='api_tag_user_name_id_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -85,12 +118,55 @@ class Task(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name', 'id'],
+                name='api_task_user_name_id_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class ImageBlob(models.Model):
+    """
+    Uploaded image stored once per distinct content, identified by the
+    SHA-256 of the uploaded bytes and shared by every business using it
+    """
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
+    digest = models.CharField(max_length=64, unique=True)
+    image = models.ImageField(upload_to=image_blob_file_path)
+    thumbnail = models.ImageField(null=True, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=IMAGE_STATUS_CHOICES,
+        default=IMAGE_PENDING
+    )
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.digest
+
+
 class Business(models.Model):
     """ Business object """
+    IMAGE_PENDING = ImageBlob.IMAGE_PENDING
+    IMAGE_READY = ImageBlob.IMAGE_READY
+    IMAGE_FAILED = ImageBlob.IMAGE_FAILED
+    IMAGE_STATUS_CHOICES = ImageBlob.IMAGE_STATUS_CHOICES
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -99,6 +175,65 @@ class Business(models.Model):
     task = models.ManyToManyField('Task')
     tag = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=business_image_file_path)
+    image_status = models.CharField(
+        max_length=10,
+        choices=IMAGE_STATUS_CHOICES,
+        blank=True
+    )
+    thumbnail = models.ImageField(
+        null=True,
+        blank=True,
+        upload_to=business_thumbnail_file_path
+    )
+    image_blob = models.ForeignKey(
+        'ImageBlob',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='businesses'
+    )
+
+    def __str__(self):
+        return self.title
+
+
+class UploadSession(models.Model):
+    """ Resumable upload of a business image, received in chunks """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey(
+        'Business',
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.received}/{self.size})'
+
+
+class ImportCheckpoint(models.Model):
+    """ Progress of an NDJSON import, committed with each imported batch """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='import_checkpoints'
+    )
+    source = models.CharField(max_length=255)
+    line = models.PositiveIntegerField(default=0)
+    file_ids = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'source'],
+                name='api_importcheckpoint_user_source'
+            ),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f'{self.source} (line {self.line})'
@@ -1,5 +1,72 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
 from rest_framework import permissions
 
+
+def _group_cache():
+    options = getattr(settings, 'GROUP_CACHE', {})
+    return caches[options.get('CACHE_ALIAS', 'default')]
+
+
+def _group_cache_timeout(cache):
+    """
+    Return how long group names are cached. Invalidation cannot reach the
+    caches of other processes, so a per-process cache keeps entries only
+    for LOCAL_TIMEOUT seconds; a revoked group keeps granting access on
+    other workers for at most that long.
+    """
+    options = getattr(settings, 'GROUP_CACHE', {})
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return options.get('LOCAL_TIMEOUT', 5)
+    return options.get('TIMEOUT', 300)
+
+
+def _group_cache_key(user_id):
+    return f'user-groups:{user_id}'
+
+
+def get_group_names(user):
+    """ Return the names of the groups user belongs to, from the cache """
+    if not user or not user.is_authenticated:
+        return frozenset()
+    cache = _group_cache()
+    key = _group_cache_key(user.pk)
+    names = cache.get(key)
+    if names is None:
+        names = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, names, _group_cache_timeout(cache))
+    return names
+
+
+def invalidate_group_names(user_ids):
+    """ Forget the cached group names of the given users """
+    keys = [_group_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        _group_cache().delete_many(keys)
+
+
+def get_request_group_names(request):
+    """ Return the group names of the request user, loaded once per request """
+    names = getattr(request, '_group_names', None)
+    if names is None:
+        names = get_group_names(request.user)
+        request._group_names = names
+    return names
+
+
+class GroupPermission(permissions.BasePermission):
+    """ Allow members of group_name, optionally only for some methods """
+    group_name = None
+    methods = None
+
+    def has_permission(self, request, view):
+        if self.methods is not None and request.method not in self.methods:
+            return False
+        return self.group_name in get_request_group_names(request)
+
+
 class UpdateOwnProfile(permissions.BasePermission):
     """ Allow user to edit their own profile """
     def has_object_permission(self, request, view, obj):
@@ -16,9 +83,7 @@ class UpdateOwnSatus(permissions.BasePermission):
             return True
         return obj.user_profile.id == request.user.id
 
-class SalesOnly(permissions.BasePermission):
+class SalesOnly(GroupPermission):
     """ Allow sales team to access get and post request"""
-    def has_permission(self, request, view):
-        if request.user.groups.filter(name='Sales').exists() and request.method in ['GET', 'POST']:
-            return True
-        return False
\ No newline at end of file
+    group_name = 'Sales'
+    methods = ('GET', 'POST')
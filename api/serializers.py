@@ -1,9 +1,33 @@
-from rest_framework import serializers
+import copy
+
+from rest_framework import exceptions, serializers
 from django.contrib.auth import authenticate, get_user_model
 from django.utils.translation import ugettext_lazy as _
 
+from api.authentication import verify_refresh_token
+
+
+class CachedFieldsMixin:
+    """
+    Build the field map of a serializer class once per process and hand
+    each instance a deep copy of it, skipping the model introspection
+    ModelSerializer.get_fields() repeats on every construction.
+
+    Only for serializers whose fields do not depend on the instance or
+    context; anything request specific must happen when fields are bound.
+    """
+    _field_templates = {}
+
+    def get_fields(self):
+        cls = type(self)
+        template = self._field_templates.get(cls)
+        if template is None:
+            template = super().get_fields()
+            self._field_templates[cls] = template
+        return copy.deepcopy(template)
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """ Serialiser for the user object"""
     class Meta:
         model = get_user_model()
@@ -45,4 +69,19 @@ class AuthTokenSerializer(serializers.Serializer):
             msg = _('Unable to authenticate with provided credentials')
             raise serializers.ValidationError(msg, code='authentication')
         attrs['user'] = user
+        return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """ Serializer for exchanging a refresh token for new signed tokens """
+    refresh = serializers.CharField(trim_whitespace=True)
+
+    def validate(self, attrs):
+        """ Validate the refresh token and return its user """
+        try:
+            attrs['user'] = verify_refresh_token(attrs['refresh'])
+        except exceptions.AuthenticationFailed as exc:
+            raise serializers.ValidationError(
+                exc.detail, code='authentication'
+            )
         return attrs
\ No newline at end of file
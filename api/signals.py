@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete,
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.permissions import invalidate_group_names
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """ Drop a token from the cache when it is regenerated or deleted """
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """ Drop cached tokens when a user is changed, deactivated or deleted """
+    keys = ()
+    if token_cache.shared is not None:
+        keys = list(Token.objects.filter(user_id=instance.pk).values_list(
+            'key', flat=True
+        ))
+    token_cache.invalidate_user(instance.pk, keys=keys)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def invalidate_user_groups(sender, instance, action, reverse, pk_set, **kwargs):
+    """ Drop cached group names when group membership changes """
+    if action in ('post_add', 'post_remove'):
+        user_ids = pk_set if reverse else [instance.pk]
+    elif action == 'pre_clear':
+        user_ids = (
+            list(instance.user_set.values_list('id', flat=True))
+            if reverse else [instance.pk]
+        )
+    else:
+        return
+    invalidate_group_names(user_ids)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_members(sender, instance, **kwargs):
+    """ Drop cached group names of members when a group is renamed or deleted """
+    if kwargs.get('created'):
+        return
+    invalidate_group_names(instance.user_set.values_list('id', flat=True))
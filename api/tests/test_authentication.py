@@ -0,0 +1,231 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import (
+    CachedTokenAuthentication,
+    issue_signed_tokens,
+    token_cache,
+)
+from api.cache import LRUCache
+
+
+ME_URL = reverse('api:me')
+SIGNED_TOKEN_URL = reverse('api:token-signed')
+REFRESH_URL = reverse('api:token-refresh')
+REVOKE_URL = reverse('api:token-revoke')
+
+
+class LRUCacheTests(TestCase):
+    """ Test the in-process LRU cache """
+    def test_evicts_least_recently_used(self):
+        """ Test the oldest unused entry is evicted when full """
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('api.cache.time.monotonic')
+    def test_entries_expire(self, monotonic):
+        """ Test entries are dropped once their TTL has passed """
+        monotonic.return_value = 100
+        cache = LRUCache(ttl=10)
+        cache.set('a', 1)
+
+        monotonic.return_value = 111
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """ Test token authentication served from the token cache """
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@email.com',
+            name='user name',
+            password='Password123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_skip_token_query(self):
+        """ Test only the first request looks the token up """
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_deleted_token_rejected(self):
+        """ Test a deleted token stops authenticating immediately """
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """ Test a deactivated user stops authenticating immediately """
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_signed_token_user_entry_not_a_token(self):
+        """ Test a cached signed-token user cannot be used as a token """
+        access = issue_signed_tokens(self.user)['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.client.get(ME_URL)
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token user:{self.user.pk}'
+        )
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_malformed_key_rejected_without_lookup(self):
+        """ Test keys not shaped like a token never reach the cache """
+        self.client.credentials(HTTP_AUTHORIZATION='Token not-a-key')
+
+        with patch.object(token_cache, 'get') as get, \
+                self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        get.assert_not_called()
+
+    def test_cached_entry_is_fresh_per_request(self):
+        """ Test each hit gets its own user and no password hash is kept """
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(self.token.key)
+        user, token = auth.authenticate_credentials(self.token.key)
+        again, _ = auth.authenticate_credentials(self.token.key)
+
+        self.assertIsNot(user, again)
+        self.assertIsNot(user._state, again._state)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token.key, self.token.key)
+        self.assertNotIn('password', user.__dict__)
+        self.assertNotIn(self.user.password, repr(token_cache.local._data))
+
+    def test_profile_update_visible(self):
+        """ Test updating the profile is not hidden by the cache """
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'new name'})
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.data['name'], 'new name')
+
+
+class SignedTokenAuthenticationTests(TestCase):
+    """ Test the opt-in signed access and refresh tokens """
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@email.com',
+            name='user name',
+            password='Password123'
+        )
+        self.client = APIClient()
+
+    def _obtain(self):
+        res = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'user@email.com',
+            'password': 'Password123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_access_token_authenticates_without_queries(self):
+        """ Test a warm signed token is verified without the database """
+        tokens = self._obtain()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_tampered_token_rejected(self):
+        """ Test a token with a modified signature is rejected """
+        access = self._obtain()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}x')
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(SIGNED_TOKEN={'ACCESS_TTL': -1})
+    def test_expired_token_rejected(self):
+        """ Test an access token past its lifetime is rejected """
+        access = issue_signed_tokens(self.user)['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_invalidates_tokens(self):
+        """ Test revoking bumps the counter and rejects older tokens """
+        tokens = self._obtain()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.client.get(ME_URL)
+
+        res = self.client.post(REVOKE_URL)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_issues_new_access_token(self):
+        """ Test a refresh token can be exchanged for a working pair """
+        tokens = self._obtain()
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {res.data["access"]}')
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_refresh_token_used_once(self):
+        """ Test refreshing rotates the pair and retires the old token """
+        tokens = self._obtain()
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+        self.assertNotEqual(res.data['refresh'], tokens['refresh'])
+
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_access_token_cannot_refresh(self):
+        """ Test an access token is not accepted as a refresh token """
+        tokens = self._obtain()
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['access']})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_database_tokens_still_accepted(self):
+        """ Test existing DB backed tokens keep working """
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.bulk import bulk_insert
+from api.models import Tag
+
+
+class BulkInsertTests(TestCase):
+    """ Test bulk inserts return rows with their primary keys """
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        Tag.objects.create(user=self.user, name='existing')
+
+    def _insert(self, count):
+        tags = [Tag(user=self.user, name=f'tag {i}') for i in range(count)]
+        with CaptureQueriesContext(connection) as queries:
+            bulk_insert(Tag, tags, batch_size=50)
+        return tags, len(queries)
+
+    def test_primary_keys_match_rows(self):
+        """ Test every object gets the id of the row holding its values """
+        tags, _ = self._insert(120)
+
+        stored = dict(Tag.objects.values_list('pk', 'name'))
+        for tag in tags:
+            self.assertEqual(stored[tag.pk], tag.name)
+            self.assertFalse(tag._state.adding)
+
+    def test_inserts_in_batches(self):
+        """ Test the number of statements grows with batches, not rows """
+        _, few = self._insert(10)
+        _, many = self._insert(50)
+        self.assertEqual(few, many)
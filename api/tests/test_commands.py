@@ -1,8 +1,32 @@
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from io import BytesIO, StringIO
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from api.models import (
+    Business,
+    ImageBlob,
+    ImportCheckpoint,
+    Tag,
+    Task,
+    UploadSession,
+)
+from business import images
+from business.export import iter_business_graph
+from business.uploads import session_path
 
 
 class CommandTests(TestCase):
@@ -21,3 +45,420 @@ class CommandTests(TestCase):
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
 
+
+    def test_benchmark_rolls_back(self):
+        ''' Test a benchmark run leaves no rows behind '''
+        out = StringIO()
+        call_command('benchmark', 'auth', iterations=2, stdout=out)
+        self.assertIn('CachedTokenAuthentication', out.getvalue())
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_explain_queries(self):
+        ''' Test query plans are printed for every viewset query '''
+        get_user_model().objects.create_user('user@email.com', 'Password123')
+        out = StringIO()
+        call_command('explain_queries', 'user@email.com', stdout=out)
+        self.assertIn('== tags assigned_only', out.getvalue())
+        self.assertIn('== business by task', out.getvalue())
+
+    def test_explain_queries_unknown_user(self):
+        ''' Test an unknown email is reported '''
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', 'nobody@email.com')
+
+
+class ImportNDJSONCommandTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@email.com', 'Password123'
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'import.ndjson')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, records):
+        with open(self.path, 'w') as f:
+            for record in records:
+                f.write(f'{json.dumps(record)}\n')
+
+    def _import(self, **options):
+        out = StringIO()
+        call_command(
+            'import_ndjson', 'user@email.com', self.path, stdout=out,
+            **options
+        )
+        return out.getvalue()
+
+    def test_import_resolves_names_and_ids(self):
+        ''' Test businesses link tags by name and by file id '''
+        existing = Tag.objects.create(user=self.user, name='Sales')
+        self._write([
+            {'type': 'tag', 'id': 7, 'name': 'Retail'},
+            {'type': 'task', 'id': 3, 'name': 'Invoice'},
+            {'type': 'business', 'title': 'shop',
+             'tag': [7, 'Sales', 'New'], 'task': [3]},
+            {'type': 'business', 'title': 'empty'},
+        ])
+
+        out = self._import(batch_size=2)
+
+        self.assertIn('rows/s', out)
+        shop = Business.objects.get(user=self.user, title='shop')
+        self.assertEqual(
+            sorted(shop.tag.values_list('name', flat=True)),
+            ['New', 'Retail', 'Sales']
+        )
+        self.assertIn(existing, shop.tag.all())
+        self.assertEqual(list(shop.task.values_list('name', flat=True)),
+                         ['Invoice'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_import_resumes_from_checkpoint(self):
+        ''' Test lines before the checkpoint are not imported again '''
+        tag = Tag.objects.create(user=self.user, name='Retail')
+        self._write([
+            {'type': 'tag', 'id': 7, 'name': 'Retail'},
+            {'type': 'business', 'title': 'imported'},
+            {'type': 'business', 'title': 'pending', 'tag': [7]},
+        ])
+        ImportCheckpoint.objects.create(
+            user=self.user, source=self.path, line=2,
+            file_ids={'tag': {'7': tag.id}, 'task': {}}
+        )
+
+        out = self._import()
+
+        self.assertIn('Resuming after line 2', out)
+        self.assertEqual(
+            list(Business.objects.values_list('title', flat=True)),
+            ['pending']
+        )
+        self.assertEqual(Business.objects.get().tag.get(), tag)
+
+    def test_import_failure_keeps_committed_batches(self):
+        ''' Test a bad line stops the import after the last good batch '''
+        self._write([
+            {'type': 'business', 'title': 'first'},
+            {'type': 'business', 'title': 'second', 'tag': [99]},
+        ])
+
+        with self.assertRaises(CommandError):
+            self._import(batch_size=1)
+
+        self.assertEqual(
+            list(Business.objects.values_list('title', flat=True)),
+            ['first']
+        )
+        self.assertEqual(ImportCheckpoint.objects.get().line, 1)
+
+    def test_checkpoint_committed_with_batch(self):
+        ''' Test a batch that fails to commit leaves the checkpoint behind '''
+        self._write([
+            {'type': 'business', 'title': 'first'},
+            {'type': 'business', 'title': 'second'},
+        ])
+        save = ImportCheckpoint.save
+
+        def crash_on_second(checkpoint, *args, **kwargs):
+            save(checkpoint, *args, **kwargs)
+            if checkpoint.line == 2:
+                raise OperationalError('connection lost')
+
+        with patch.object(ImportCheckpoint, 'save', crash_on_second):
+            with self.assertRaises(OperationalError):
+                self._import(batch_size=1)
+        self.assertEqual(ImportCheckpoint.objects.get().line, 1)
+
+        self._import(batch_size=1)
+
+        self.assertEqual(
+            sorted(Business.objects.values_list('title', flat=True)),
+            ['first', 'second']
+        )
+
+    def test_checkpoint_not_shared_between_users(self):
+        ''' Test another user's checkpoint for the file is not resumed '''
+        other = get_user_model().objects.create_user(
+            'other@email.com', 'Password123'
+        )
+        ImportCheckpoint.objects.create(user=other, source=self.path, line=1)
+        self._write([{'type': 'business', 'title': 'shop'}])
+
+        out = self._import()
+
+        self.assertNotIn('Resuming', out)
+        self.assertTrue(Business.objects.filter(user=self.user).exists())
+        self.assertEqual(ImportCheckpoint.objects.get().user, other)
+
+    def test_import_rejects_non_integer_ids(self):
+        ''' Test tag/task ids other than integers are refused '''
+        for file_id in ('7', 7.5, True, [7], {'id': 7}):
+            self._write([{'type': 'tag', 'id': file_id, 'name': 'Retail'}])
+
+            with self.assertRaisesMessage(CommandError,
+                                          'id must be an integer'):
+                self._import()
+        self.assertFalse(Tag.objects.exists())
+
+    def test_import_rejects_non_list_links(self):
+        ''' Test tags/tasks given as anything but a list are refused '''
+        self._write([{'type': 'business', 'title': 'shop', 'tag': 'Sales'}])
+
+        with self.assertRaisesMessage(CommandError, 'tag must be a list'):
+            self._import()
+        self.assertFalse(Business.objects.exists())
+
+    def test_import_exported_file(self):
+        ''' Test a business export can be imported for another user '''
+        other = get_user_model().objects.create_user(
+            'other@email.com', 'Password123'
+        )
+        tag = Tag.objects.create(user=other, name='Sales')
+        task = Task.objects.create(user=other, name='Invoice')
+        business = Business.objects.create(user=other, title='shop')
+        business.tag.add(tag)
+        business.task.add(task)
+        with open(self.path, 'wb') as f:
+            for chunk in iter_business_graph(
+                    other, Business.objects.filter(user=other)):
+                f.write(chunk)
+
+        self._import()
+
+        imported = Business.objects.get(user=self.user)
+        self.assertEqual(imported.tag.get().name, 'Sales')
+        self.assertEqual(imported.task.get().name, 'Invoice')
+
+
+class SeedDataCommandTests(TestCase):
+    def _seed(self, **options):
+        call_command('seed_data', stdout=StringIO(), **options)
+
+    def _snapshot(self):
+        return [
+            (b.user.email, b.title,
+             sorted(b.tag.values_list('name', flat=True)),
+             sorted(b.task.values_list('name', flat=True)))
+            for b in Business.objects.order_by('id')
+        ]
+
+    def test_seed_counts(self):
+        ''' Test fixed distributions create the requested graph '''
+        self._seed(users=3, tags=4, tasks=2, businesses=5, fanout=2,
+                   distribution='fixed', batch_size=7)
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertEqual(Tag.objects.count(), 12)
+        self.assertEqual(Task.objects.count(), 6)
+        self.assertEqual(Business.objects.count(), 15)
+        self.assertEqual(Business.tag.through.objects.count(), 30)
+        for business in Business.objects.all():
+            self.assertEqual(
+                set(business.tag.values_list('user_id', flat=True)),
+                {business.user_id}
+            )
+
+    def test_seed_reproducible(self):
+        ''' Test the same seed generates the same data '''
+        self._seed(users=2, businesses=5, distribution='pareto', seed=3)
+        first = self._snapshot()
+        get_user_model().objects.all().delete()
+
+        self._seed(users=2, businesses=5, distribution='pareto', seed=3)
+        self.assertEqual(self._snapshot(), first)
+
+    def test_seeded_users_usable(self):
+        ''' Test seeded users share a working password and ids continue '''
+        self._seed(users=2, tags=1, password='Secret123')
+
+        user = get_user_model().objects.first()
+        self.assertTrue(user.check_password('Secret123'))
+        tag = Tag.objects.create(user=user, name='new')
+        self.assertGreater(tag.id, Tag.objects.exclude(id=tag.id).count())
+
+
+class GCImageBlobsCommandTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.old = timezone.now() - timedelta(days=1)
+
+    def _blob(self, digest, refcount=0, created_at=None):
+        blob = ImageBlob(digest=digest, refcount=refcount, size=4)
+        blob.image.save('logo.jpg', ContentFile(b'data'), save=False)
+        blob.save()
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            created_at=created_at or self.old
+        )
+        return blob
+
+    def _gc(self, **options):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('gc_image_blobs', stdout=StringIO(), **options)
+
+    def test_gc_deletes_unreferenced(self):
+        ''' Test only old blobs nothing references are collected '''
+        unused = self._blob('a' * 64)
+        used = self._blob('b' * 64, refcount=1)
+        Business.objects.create(user=self.user, title='shop', image_blob=used)
+        recent = self._blob('c' * 64, created_at=timezone.now())
+
+        self._gc()
+
+        self.assertEqual(
+            set(ImageBlob.objects.values_list('pk', flat=True)),
+            {used.pk, recent.pk}
+        )
+        self.assertFalse(os.path.exists(unused.image.path))
+        self.assertTrue(os.path.exists(used.image.path))
+
+    def test_gc_dry_run(self):
+        ''' Test a dry run reports without deleting '''
+        blob = self._blob('a' * 64)
+        out = StringIO()
+        call_command('gc_image_blobs', dry_run=True, stdout=out)
+
+        self.assertIn('Would delete 1 blobs', out.getvalue())
+        self.assertTrue(ImageBlob.objects.filter(pk=blob.pk).exists())
+
+    def test_gc_recount(self):
+        ''' Test drifted reference counts are corrected before collecting '''
+        leaked = self._blob('a' * 64, refcount=3)
+        undercounted = self._blob('b' * 64, refcount=0)
+        Business.objects.create(user=self.user, title='shop',
+                                image_blob=undercounted)
+
+        self._gc(recount=True)
+
+        self.assertFalse(ImageBlob.objects.filter(pk=leaked.pk).exists())
+        undercounted.refresh_from_db()
+        self.assertEqual(undercounted.refcount, 1)
+
+
+class CleanupUploadSessionsCommandTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        uploads = override_settings(IMAGE_UPLOADS={'DIR': self.directory})
+        uploads.enable()
+        self.addCleanup(uploads.disable)
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+        user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.business = Business.objects.create(user=user, title='shop')
+
+    def _session(self, idle):
+        session = UploadSession.objects.create(
+            business=self.business, filename='photo.jpg', size=10
+        )
+        UploadSession.objects.filter(pk=session.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=idle)
+        )
+        with open(session_path(session), 'wb') as f:
+            f.write(b'data')
+        return session
+
+    def test_cleanup_abandoned_sessions(self):
+        ''' Test idle sessions and orphaned chunks are deleted '''
+        stale = self._session(idle=7200)
+        active = self._session(idle=10)
+        orphan = os.path.join(self.directory, f'{uuid.uuid4()}.part')
+        with open(orphan, 'wb') as f:
+            f.write(b'data')
+        os.utime(orphan, (0, 0))
+
+        call_command('cleanup_upload_sessions', max_age=3600,
+                     stdout=StringIO())
+
+        self.assertEqual(list(UploadSession.objects.all()), [active])
+        self.assertFalse(os.path.exists(session_path(stale)))
+        self.assertTrue(os.path.exists(session_path(active)))
+        self.assertFalse(os.path.exists(orphan))
+
+    def test_cleanup_dry_run(self):
+        ''' Test a dry run reports without deleting '''
+        stale = self._session(idle=7200)
+        out = StringIO()
+        call_command('cleanup_upload_sessions', max_age=3600, dry_run=True,
+                     stdout=out)
+
+        self.assertIn('Would delete 1 sessions', out.getvalue())
+        self.assertTrue(os.path.exists(session_path(stale)))
+
+
+class ProcessPendingImagesCommandTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.business = Business.objects.create(user=user, title='shop')
+
+    def _pending(self, age):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20)).save(buffer, format='JPEG')
+        with patch.object(images, 'schedule'):
+            images.store_image(
+                self.business,
+                SimpleUploadedFile('photo.jpg', buffer.getvalue())
+            )
+        ImageBlob.objects.update(
+            created_at=timezone.now() - timedelta(seconds=age)
+        )
+        return self.business.image_blob
+
+    def _process(self, **options):
+        out = StringIO()
+        call_command('process_pending_images', stdout=out, **options)
+        return out.getvalue()
+
+    def test_stale_pending_processed(self):
+        ''' Test a blob whose job never ran is processed '''
+        blob = self._pending(age=3600)
+
+        out = self._process()
+
+        self.assertIn('Processed 1 pending images', out)
+        blob.refresh_from_db()
+        self.business.refresh_from_db()
+        self.assertEqual(blob.status, ImageBlob.IMAGE_READY)
+        self.assertEqual(self.business.image_status, Business.IMAGE_READY)
+
+    def test_recent_pending_skipped(self):
+        ''' Test blobs a pool may still be working on are left alone '''
+        blob = self._pending(age=10)
+
+        out = self._process()
+
+        self.assertIn('Processed 0 pending images', out)
+        blob.refresh_from_db()
+        self.assertEqual(blob.status, ImageBlob.IMAGE_PENDING)
+
+    def test_dry_run(self):
+        ''' Test a dry run reports without processing '''
+        blob = self._pending(age=3600)
+
+        out = self._process(dry_run=True)
+
+        self.assertIn('Would process 1 pending images', out)
+        blob.refresh_from_db()
+        self.assertEqual(blob.status, ImageBlob.IMAGE_PENDING)
@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.permissions import SalesOnly, _group_cache_timeout
+
+
+class SalesOnlyPermissionTests(TestCase):
+    """ Test group based permissions backed by the group cache """
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.sales = Group.objects.create(name='Sales')
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+
+    def _request(self, method='get'):
+        request = Request(getattr(self.factory, method)('/'))
+        request.user = self.user
+        return request
+
+    def test_sales_member_allowed(self):
+        """ Test members of the sales group may GET """
+        self.user.groups.add(self.sales)
+        self.assertTrue(SalesOnly().has_permission(self._request(), None))
+
+    def test_non_member_denied(self):
+        """ Test users outside the sales group are denied """
+        self.assertFalse(SalesOnly().has_permission(self._request(), None))
+
+    def test_method_not_allowed(self):
+        """ Test sales members may not use other methods """
+        self.user.groups.add(self.sales)
+        request = self._request('delete')
+        self.assertFalse(SalesOnly().has_permission(request, None))
+
+    def test_membership_cached_between_requests(self):
+        """ Test membership is loaded once and then served from cache """
+        self.user.groups.add(self.sales)
+        SalesOnly().has_permission(self._request(), None)
+
+        with self.assertNumQueries(0):
+            request = self._request()
+            SalesOnly().has_permission(request, None)
+            SalesOnly().has_permission(request, None)
+
+    def test_membership_change_invalidates(self):
+        """ Test adding or removing a group is seen on the next request """
+        self.assertFalse(SalesOnly().has_permission(self._request(), None))
+        self.user.groups.add(self.sales)
+        self.assertTrue(SalesOnly().has_permission(self._request(), None))
+        self.sales.user_set.remove(self.user)
+        self.assertFalse(SalesOnly().has_permission(self._request(), None))
+
+    def test_group_rename_invalidates(self):
+        """ Test renaming a group revokes the permission of its members """
+        self.user.groups.add(self.sales)
+        SalesOnly().has_permission(self._request(), None)
+        self.sales.name = 'Marketing'
+        self.sales.save()
+
+        self.assertFalse(SalesOnly().has_permission(self._request(), None))
+
+    @override_settings(GROUP_CACHE={'TIMEOUT': 300, 'LOCAL_TIMEOUT': 5})
+    def test_per_process_cache_expires_quickly(self):
+        """ Test a local cache bounds how long revoked groups linger """
+        self.assertEqual(_group_cache_timeout(caches['default']), 5)
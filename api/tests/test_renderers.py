@@ -0,0 +1,109 @@
+import io
+import unittest
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.models import Business
+from api.renderers import (
+    MessagePackParser,
+    MessagePackRenderer,
+    ORJSONParser,
+    ORJSONRenderer,
+    msgpack,
+)
+
+
+BUSINESS_URL = reverse('business:business-list')
+
+SAMPLE = OrderedDict([
+    ('id', 1),
+    ('title', 'Zoë \U0001f680 \u2028 line break'),
+    ('tag', [1, 2, 3]),
+    ('price', Decimal('1.50')),
+    ('detail', _('Not found.')),
+    ('errors', [ErrorDetail('This field is required.', code='required')]),
+    ('empty', None),
+])
+
+
+class ORJSONRendererTests(TestCase):
+    """ Test the orjson renderer and parser """
+    def test_matches_json_renderer(self):
+        """ Test the output is byte-identical to JSONRenderer """
+        self.assertEqual(
+            ORJSONRenderer().render(SAMPLE),
+            JSONRenderer().render(SAMPLE)
+        )
+
+    def test_indent_requested(self):
+        """ Test an indent media type parameter pretty prints """
+        ret = ORJSONRenderer().render(
+            {'a': 1}, 'application/json; indent=2'
+        )
+        self.assertIn(b'\n', ret)
+
+    def test_wide_int_falls_back(self):
+        """ Test integers orjson cannot encode are rendered like json """
+        data = {'id': 2 ** 64, 'title': 'Zoë \u2028'}
+        self.assertEqual(
+            ORJSONRenderer().render(data),
+            JSONRenderer().render(data)
+        )
+
+    def test_parse(self):
+        """ Test a JSON body is parsed """
+        data = ORJSONParser().parse(io.BytesIO(b'{"title": "Zo\xc3\xab"}'))
+        self.assertEqual(data, {'title': 'Zoë'})
+
+    def test_parse_error(self):
+        """ Test malformed JSON raises a ParseError """
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"title": '))
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class MessagePackTests(TestCase):
+    """ Test the MessagePack renderer and parser """
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_round_trip(self):
+        """ Test rendered data parses back to the same values """
+        data = MessagePackParser().parse(
+            io.BytesIO(MessagePackRenderer().render(SAMPLE))
+        )
+        self.assertEqual(data['title'], SAMPLE['title'])
+        self.assertEqual(data['detail'], 'Not found.')
+
+    def test_negotiated_by_accept(self):
+        """ Test the business list is rendered as MessagePack on request """
+        Business.objects.create(user=self.user, title='sales')
+
+        res = self.client.get(BUSINESS_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(res.content)[0]['title'], 'sales')
+
+    def test_parsed_by_content_type(self):
+        """ Test a MessagePack body creates a business """
+        res = self.client.post(
+            BUSINESS_URL,
+            msgpack.packb({'title': 'sales', 'tag': [], 'task': []}),
+            content_type='application/msgpack'
+        )
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(Business.objects.filter(title='sales').exists())
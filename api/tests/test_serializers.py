@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from api.serializers import CachedFieldsMixin, UserSerializer
+from business.serializers import BusinessDetailSerializer, BusinessSerializer
+
+
+class CachedFieldsMixinTests(TestCase):
+    """ Test serializer field maps are built once per class """
+    def test_template_built_once(self):
+        """ Test later instances reuse the cached field map """
+        UserSerializer().fields
+        template = CachedFieldsMixin._field_templates[UserSerializer]
+
+        fields = UserSerializer().get_fields()
+        self.assertEqual(list(fields), list(template))
+        self.assertIs(CachedFieldsMixin._field_templates[UserSerializer],
+                      template)
+
+    def test_instances_get_independent_fields(self):
+        """ Test binding one instance's fields leaves others untouched """
+        first = UserSerializer()
+        second = UserSerializer()
+
+        self.assertIsNot(first.fields['email'], second.fields['email'])
+        self.assertIs(first.fields['email'].parent, first)
+        self.assertIs(second.fields['email'].parent, second)
+
+    def test_subclasses_cached_separately(self):
+        """ Test a subclass overriding fields gets its own map """
+        list_fields = BusinessSerializer().fields
+        detail_fields = BusinessDetailSerializer().fields
+
+        self.assertNotEqual(type(list_fields['tag']),
+                            type(detail_fields['tag']))
+
+    def test_write_only_options_kept(self):
+        """ Test Meta extra_kwargs still apply to cached fields """
+        serializer = UserSerializer(data={
+            'email': 'user@email.com', 'password': 'pw', 'name': 'name'
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('password', serializer.errors)
+        self.assertTrue(serializer.fields['password'].write_only)
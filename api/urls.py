@@ -6,5 +6,8 @@ app_name = 'api'
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
+    path('token/signed/', views.CreateSignedTokenView.as_view(), name='token-signed'),
+    path('token/refresh/', views.RefreshSignedTokenView.as_view(), name='token-refresh'),
+    path('token/revoke/', views.RevokeSignedTokenView.as_view(), name='token-revoke'),
     path('me/', views.ManageUserView.as_view(), name='me'),
 ]
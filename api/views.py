@@ -1,7 +1,14 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 from rest_framework.authtoken.views import ObtainAuthToken
 from api import serializers
+from api.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    issue_signed_tokens,
+    revoke_signed_tokens,
+)
 
 class CreateUserView(generics.CreateAPIView):
     """ Create a new user in the system """
@@ -12,10 +19,37 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = serializers.AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+class CreateSignedTokenView(CreateTokenView):
+    """ Create a signed access/refresh token pair for user """
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        return Response(issue_signed_tokens(user))
+
+class RefreshSignedTokenView(CreateTokenView):
+    """ Exchange a refresh token for a new signed token pair """
+    serializer_class = serializers.RefreshTokenSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        return Response(issue_signed_tokens(user))
+
+class RevokeSignedTokenView(generics.GenericAPIView):
+    """ Revoke every signed token issued to the authenticated user """
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        revoke_signed_tokens(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """ Manage the authenticated user """
     serializer_class = serializers.UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class BusinessConfig(AppConfig):
     name = 'business'
+
+    def ready(self):
+        from django.core import checks
+
+        from business import signals  # noqa: F401
+        from business.checks import check_version_cache
+
+        checks.register(check_version_cache, checks.Tags.caches)
@@ -0,0 +1,150 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+
+class ResponseCache:
+    """
+    Cache of list/detail response data. Keys embed the user's collection
+    version, so the model and m2m_changed signals that bump versions
+    invalidate every affected entry; stale entries simply expire.
+    """
+    key_prefix = 'response-cache'
+
+    @property
+    def options(self):
+        return getattr(settings, 'RESPONSE_CACHE', {})
+
+    @property
+    def cache(self):
+        return caches[self.options.get('CACHE_ALIAS', 'default')]
+
+    def fetch(self, key, build):
+        """ Return a cached response for key, or build and cache one """
+        data = self.cache.get(f'{self.key_prefix}:{key}')
+        if data is not None:
+            self._count('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        self._count('misses')
+        response = build()
+        if response.status_code == 200 and response.data is not None:
+            self.cache.set(
+                f'{self.key_prefix}:{key}',
+                response.data,
+                self.options.get('TIMEOUT', 300)
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def stats(self):
+        """ Return the hit and miss counters """
+        counters = self.cache.get_many([
+            f'{self.key_prefix}:stats:hits',
+            f'{self.key_prefix}:stats:misses',
+        ])
+        return {
+            'hits': counters.get(f'{self.key_prefix}:stats:hits', 0),
+            'misses': counters.get(f'{self.key_prefix}:stats:misses', 0),
+        }
+
+    def reset_stats(self):
+        """ Reset the hit and miss counters """
+        self.cache.delete_many([
+            f'{self.key_prefix}:stats:hits',
+            f'{self.key_prefix}:stats:misses',
+        ])
+
+    def _count(self, counter):
+        key = f'{self.key_prefix}:stats:{counter}'
+        if not self.cache.add(key, 1, None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, 1, None)
+
+
+response_cache = ResponseCache()
+
+
+class RepresentationCache:
+    """
+    Cache of serialized objects keyed by (model, pk, serializer class,
+    request origin, row version). File fields render as absolute URLs
+    built from the request, so the scheme and host are part of the key.
+    Saving, deleting or relinking a row bumps its version, which evicts
+    every representation of it at once.
+    """
+    key_prefix = 'repr'
+
+    @property
+    def options(self):
+        return getattr(settings, 'REPRESENTATION_CACHE', {})
+
+    @property
+    def cache(self):
+        return caches[self.options.get('CACHE_ALIAS', 'default')]
+
+    def _version_key(self, model, pk):
+        return f'{self.key_prefix}:version:{model._meta.label_lower}:{pk}'
+
+    def _set_versions(self, model, pks):
+        now = time.time_ns()
+        self.cache.set_many({
+            self._version_key(model, pk): now for pk in pks
+        }, None)
+
+    def bump(self, model, pks):
+        """ Evict every cached representation of the given rows """
+        pks = list(pks)
+        if not pks:
+            return
+        self._set_versions(model, pks)
+        transaction.on_commit(lambda: self._set_versions(model, pks))
+
+    def represent_many(self, serializer, instances):
+        """
+        Return the representations of instances, fetching cached ones in
+        one multi-get and serializing only the misses
+        """
+        if not instances:
+            return []
+        model = type(instances[0])
+        name = f'{type(serializer).__module__}.{type(serializer).__qualname__}'
+        request = serializer.context.get('request')
+        origin = f'{request.scheme}://{request.get_host()}' if request else '-'
+        version_keys = [self._version_key(model, obj.pk) for obj in instances]
+        versions = self.cache.get_many(version_keys)
+
+        keys = []
+        now = time.time_ns()
+        for obj, version_key in zip(instances, version_keys):
+            version = versions.get(version_key)
+            if version is None:
+                # Never overwrite a version a concurrent write just set
+                self.cache.add(version_key, now, None)
+                version = now
+            keys.append(f'{self.key_prefix}:{model._meta.label_lower}:'
+                        f'{obj.pk}:{name}:{origin}:{version}')
+
+        cached = self.cache.get_many(keys)
+        misses = [
+            (obj, key) for obj, key in zip(instances, keys) if key not in cached
+        ]
+        if misses:
+            serializer.load_related([obj for obj, _ in misses])
+            fresh = {
+                key: serializer.to_representation_uncached(obj)
+                for obj, key in misses
+            }
+            self.cache.set_many(fresh, self.options.get('TIMEOUT', 60 * 60))
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+
+representation_cache = RepresentationCache()
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def check_version_cache(app_configs, **kwargs):
+    """
+    Refuse a per-process cache for collection versions. Versions never
+    expire, so workers that missed a bump would answer 304 with stale
+    data; a local cache is only accepted when ALLOW_LOCAL is set.
+    """
+    options = getattr(settings, 'COLLECTION_VERSION_CACHE', {})
+    alias = options.get('CACHE_ALIAS', 'default')
+    if options.get('ALLOW_LOCAL', False) or \
+            not isinstance(caches[alias], (LocMemCache, DummyCache)):
+        return []
+    return [checks.Error(
+        f'COLLECTION_VERSION_CACHE uses the per-process cache {alias!r}.',
+        hint='Point CACHE_ALIAS at a cache shared between worker '
+             'processes, such as memcached or redis, or set ALLOW_LOCAL '
+             'for development.',
+        id='business.E001',
+    )]
@@ -0,0 +1,113 @@
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework.renderers import BaseRenderer
+
+from api.models import Tag, Task
+from api.renderers import ORJSONRenderer
+from business.fast import AttrFastSerializer, BusinessFastSerializer
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+_renderer = ORJSONRenderer()
+
+
+def export_chunk_size():
+    """ Return the number of rows fetched per database round trip """
+    return getattr(settings, 'BUSINESS_EXPORT', {}).get('CHUNK_SIZE', 2000)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renderer for newline delimited JSON. Exports stream their own body;
+    this renders anything else, such as errors, as a single line.
+    """
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return encode_line(data)
+
+
+def encode_line(data):
+    """ Return data as one NDJSON line """
+    return _renderer.render(data) + b'\n'
+
+
+def _chunks(iterator, size):
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _records(record_type, serializer, queryset, chunk_size):
+    """ Yield NDJSON encoded records of queryset, one chunk at a time """
+    rows = queryset.values(*serializer.fields).iterator(chunk_size=chunk_size)
+    for chunk in _chunks(rows, chunk_size):
+        yield b''.join(
+            encode_line({'type': record_type, **row})
+            for row in serializer.represent(chunk)
+        )
+
+
+def iter_business_graph(user, businesses, chunk_size=None):
+    """
+    Yield the user's tags, tasks and the given businesses as NDJSON, in
+    that order. Rows are read with a server-side cursor and the links of
+    each chunk are loaded together, so memory does not grow with the
+    number of rows.
+    """
+    chunk_size = chunk_size or export_chunk_size()
+    attrs = AttrFastSerializer()
+    for record_type, model in (('tag', Tag), ('task', Task)):
+        queryset = model.objects.filter(user=user).order_by('id')
+        yield from _records(record_type, attrs, queryset, chunk_size)
+    yield from _records(
+        'business', BusinessFastSerializer(), businesses.order_by('id'),
+        chunk_size
+    )
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Return whether an Accept-Encoding header allows gzip, honouring
+    q-values, so "gzip;q=0" refuses it and "*" allows it unless refused
+    """
+    qualities = {}
+    for coding in accept_encoding.split(','):
+        name, *params = [part.strip() for part in coding.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    for name in ('gzip', 'x-gzip', '*'):
+        if name in qualities:
+            return qualities[name] > 0
+    return False
+
+
+def ndjson_response(request, stream, filename):
+    """ Return a streaming NDJSON response, gzipped if the client allows """
+    gzipped = accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if gzipped:
+        stream = compress_sequence(stream)
+    response = StreamingHttpResponse(stream, content_type=NDJSON_MEDIA_TYPE)
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from business.filters import link_model
+
+# Bound on the number of ids sent in one IN (...) list
+ID_CHUNK_SIZE = 500
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class FastListSerializer:
+    """
+    Read-only list serializer building rows straight from values()
+    dictionaries. Its output must match the ModelSerializer it stands in
+    for exactly, including key order.
+    """
+    fields = ()
+
+    def represent(self, rows):
+        """ Return the representation of rows produced by values(fields) """
+        return [dict(row) for row in rows]
+
+
+class AttrFastSerializer(FastListSerializer):
+    """ Fast equivalent of TagSerializer and TaskSerializer """
+    fields = ('id', 'name')
+
+
+class BusinessFastSerializer(FastListSerializer):
+    """ Fast equivalent of BusinessSerializer """
+    fields = ('id', 'title')
+    relations = ('tag', 'task')
+
+    def represent(self, rows):
+        rows = list(rows)
+        links = self.load_links([row['id'] for row in rows])
+        return [
+            {
+                'id': row['id'],
+                'title': row['title'],
+                'tag': links['tag'].get(row['id'], []),
+                'task': links['task'].get(row['id'], []),
+            }
+            for row in rows
+        ]
+
+    def load_links(self, business_ids):
+        """ Return {relation: {business id: [related ids]}} in id order """
+        links = {field: defaultdict(list) for field in self.relations}
+        for field in self.relations:
+            through = link_model(field).objects
+            for chunk in _chunks(business_ids, ID_CHUNK_SIZE):
+                pairs = through.filter(business_id__in=chunk).order_by(
+                    'business_id', f'{field}_id'
+                ).values_list('business_id', f'{field}_id')
+                for business_id, pk in pairs:
+                    links[field][business_id].append(pk)
+        return links
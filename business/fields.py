@@ -0,0 +1,77 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+
+
+class BatchedManyRelatedField(ManyRelatedField):
+    """
+    Many related field resolving every submitted id in one query. A list
+    serializer can call prefetch() with the ids of all its items so they
+    are resolved in one query for the whole list.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prefetched = None
+
+    def prefetch(self, values):
+        """ Resolve the ids submitted by many items with a single query """
+        pks = set()
+        for data in values:
+            if isinstance(data, str) or not hasattr(data, '__iter__'):
+                continue
+            pks.update(self._to_pks(data)[0])
+        queryset = self.child_relation.get_queryset()
+        self._prefetched = queryset.in_bulk(pks) if pks else {}
+
+    def _to_pks(self, data):
+        """ Return the distinct ids in data and errors for invalid items """
+        child = self.child_relation
+        pk_field = child.get_queryset().model._meta.pk
+        pks = []
+        errors = []
+        for item in data:
+            try:
+                pks.append(pk_field.to_python(item))
+            except (DjangoValidationError, TypeError, ValueError):
+                errors.append(child.error_messages['incorrect_type'].format(
+                    data_type=type(item).__name__
+                ))
+        return list(dict.fromkeys(pks)), errors
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pks, errors = self._to_pks(data)
+        if self._prefetched is not None:
+            found = self._prefetched
+        else:
+            found = child.get_queryset().in_bulk(pks) if pks else {}
+        errors.extend(
+            child.error_messages['does_not_exist'].format(pk_value=pk)
+            for pk in pks if pk not in found
+        )
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [found[pk] for pk in pks]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """ Primary key field limited to objects owned by the request user """
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(user=request.user)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
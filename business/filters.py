@@ -0,0 +1,53 @@
+from django.db.models import Count, Exists, OuterRef, Subquery
+
+from api.models import Business
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+
+
+def link_model(field):
+    """ Return the Business through model for the 'tag' or 'task' field """
+    return Business._meta.get_field(field).remote_field.through
+
+
+def _links_to_outer(field):
+    """ Return the through rows pointing at the outer tag/task row """
+    return link_model(field).objects.filter(**{f'{field}_id': OuterRef('pk')})
+
+
+def filter_assigned(queryset, field):
+    """ Keep tags/tasks linked to at least one business (semi-join) """
+    return queryset.filter(Exists(_links_to_outer(field)))
+
+
+def filter_min_usage(queryset, field, minimum):
+    """ Keep tags/tasks linked to at least minimum businesses """
+    if minimum <= 0:
+        return queryset
+    if minimum == 1:
+        return filter_assigned(queryset, field)
+    usage = _links_to_outer(field).values(f'{field}_id').annotate(
+        count=Count('*')
+    ).values('count')
+    return queryset.alias(usage=Subquery(usage)).filter(usage__gte=minimum)
+
+
+def filter_linked(queryset, field, ids, match=MATCH_ANY):
+    """
+    Keep businesses linked to any or all of the given tag/task ids.
+
+    Both forms are evaluated against the through table inside the
+    database and never join it into the outer query, so a business
+    matching several ids is returned once.
+    """
+    ids = list(dict.fromkeys(ids or ()))
+    if not ids:
+        return queryset
+    links = link_model(field).objects.filter(**{f'{field}_id__in': ids})
+    if match == MATCH_ALL:
+        matching = links.values('business_id').annotate(
+            matched=Count('*')
+        ).filter(matched=len(ids)).values('business_id')
+        return queryset.filter(pk__in=matching)
+    return queryset.filter(Exists(links.filter(business_id=OuterRef('pk'))))
@@ -0,0 +1,274 @@
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import (
+    IntegrityError, close_old_connections, connection, transaction,
+)
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from api.models import Business, ImageBlob
+from business.cache import representation_cache
+from business.uploads import file_digest
+from business.versions import bump_for_model
+
+logger = logging.getLogger(__name__)
+
+# Formats accepted for upload, checked from the file header alone
+UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+_executor = None
+_executor_lock = threading.Lock()
+_queue_slots = None
+
+
+def pipeline_options():
+    """ Return IMAGE_PIPELINE merged over the defaults """
+    options = {
+        'WORKERS': 2,
+        'MAX_QUEUE': 100,
+        'EAGER': False,
+        'THUMBNAIL_SIZE': (256, 256),
+    }
+    options.update(getattr(settings, 'IMAGE_PIPELINE', {}))
+    return options
+
+
+def get_executor():
+    """ Return the process wide pool image jobs run on """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=pipeline_options()['WORKERS'],
+                thread_name_prefix='business-images'
+            )
+        return _executor
+
+
+def submit(blob_id):
+    """
+    Queue a blob on the pool and return whether it was queued. With
+    IMAGE_PIPELINE['MAX_QUEUE'] jobs already waiting or running the blob
+    stays pending, for the process_pending_images command to pick up.
+    """
+    global _queue_slots
+    with _executor_lock:
+        if _queue_slots is None:
+            _queue_slots = threading.BoundedSemaphore(
+                pipeline_options()['MAX_QUEUE']
+            )
+        slots = _queue_slots
+
+    if not slots.acquire(blocking=False):
+        logger.warning('Image queue full, leaving blob %s pending', blob_id)
+        return False
+    try:
+        future = get_executor().submit(_run, blob_id)
+    except RuntimeError:
+        # The pool is shutting down with the process
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return True
+
+
+def identify(file):
+    """
+    Return the format of an uploaded image from its header without
+    decoding the pixels, or None if it is not an accepted image
+    """
+    try:
+        with Image.open(file) as img:
+            image_format = img.format
+    except (OSError, Image.DecompressionBombError):
+        return None
+    finally:
+        file.seek(0)
+    return image_format if image_format in UPLOAD_FORMATS else None
+
+
+def render(file, thumbnail_size):
+    """
+    Decode an image, apply its EXIF orientation and return the re-encoded
+    image and its thumbnail as (extension, image bytes, thumbnail bytes)
+    """
+    with Image.open(file) as img:
+        img.load()
+        img = ImageOps.exif_transpose(img)
+
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        image_format, ext = 'PNG', 'png'
+    else:
+        img = img.convert('RGB')
+        image_format, ext = 'JPEG', 'jpg'
+
+    def encode(image):
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, optimize=True)
+        return buffer.getvalue()
+
+    thumbnail = img.copy()
+    thumbnail.thumbnail(thumbnail_size)
+    return ext, encode(img), encode(thumbnail)
+
+
+def blob_file_name(kind, digest, ext):
+    """ Return the storage name of a processed blob image or thumbnail """
+    return f'uploads/blobs/{kind}/{digest[:2]}/{digest}.{ext}'
+
+
+def store_upload(upload):
+    """
+    Return (blob, created) for the content of an uploaded file. The file
+    is written to storage only when no blob holds the same content yet.
+    """
+    digest = file_digest(upload)
+    blob = ImageBlob.objects.filter(digest=digest).first()
+    if blob is not None:
+        return blob, False
+
+    blob = ImageBlob(digest=digest, size=upload.size)
+    blob.image.save(upload.name, upload, save=False)
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        # The same content was stored concurrently; keep that copy
+        blob.image.storage.delete(blob.image.name)
+        return ImageBlob.objects.get(digest=digest), False
+    return blob, True
+
+
+def attach_blob(business, blob):
+    """
+    Point a business at a blob, moving the reference counts. Raises
+    ImageBlob.DoesNotExist if the blob was garbage collected meanwhile.
+    """
+    with transaction.atomic():
+        # The blob to release is the one stored now, not the one this
+        # instance was loaded with; the lock keeps it so until commit
+        previous = Business.objects.select_for_update().filter(
+            pk=business.pk
+        ).values_list('image_blob_id', flat=True).get()
+        referenced = ImageBlob.objects.filter(pk=blob.pk).update(
+            refcount=F('refcount') + 1
+        )
+        if not referenced:
+            raise ImageBlob.DoesNotExist
+        if previous is not None:
+            ImageBlob.objects.filter(pk=previous).update(
+                refcount=F('refcount') - 1
+            )
+        blob.refresh_from_db()
+        business.image_blob = blob
+        business.image = blob.image.name
+        business.thumbnail = blob.thumbnail.name or None
+        business.image_status = blob.status
+        business.save(update_fields=[
+            'image_blob', 'image', 'thumbnail', 'image_status'
+        ])
+
+
+def store_image(business, upload):
+    """
+    Store an uploaded image for a business, reusing the blob of identical
+    content, and schedule processing when the content is new
+    """
+    while True:
+        blob, created = store_upload(upload)
+        try:
+            attach_blob(business, blob)
+        except ImageBlob.DoesNotExist:
+            continue
+        break
+    if created:
+        schedule(blob)
+    return business
+
+
+def process_blob(blob_id):
+    """
+    Replace a blob's uploaded original with its oriented re-encoding and a
+    thumbnail, then mark it and every business using it ready (or failed)
+    """
+    blob = ImageBlob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return
+    original = blob.image.name
+    try:
+        with blob.image.open('rb') as f:
+            ext, data, thumbnail = render(
+                f, pipeline_options()['THUMBNAIL_SIZE']
+            )
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning('Could not process image blob %s', blob.digest,
+                       exc_info=True)
+        _finish(blob, original, status=ImageBlob.IMAGE_FAILED)
+        return
+
+    storage = blob.image.storage
+    image_name = storage.save(
+        blob_file_name('images', blob.digest, ext), ContentFile(data)
+    )
+    thumbnail_name = storage.save(
+        blob_file_name('thumbnails', blob.digest, ext), ContentFile(thumbnail)
+    )
+    if _finish(blob, original, image=image_name, thumbnail=thumbnail_name,
+               status=ImageBlob.IMAGE_READY):
+        storage.delete(original)
+    else:
+        storage.delete(image_name)
+        storage.delete(thumbnail_name)
+
+
+def _run(blob_id):
+    """ Pool entry point; pool threads manage their own connections """
+    close_old_connections()
+    try:
+        process_blob(blob_id)
+    except Exception:
+        logger.exception('Image job for blob %s failed', blob_id)
+    finally:
+        connection.close()
+
+
+def _finish(blob, original, **fields):
+    """
+    Store the results on the blob and the businesses using it, unless
+    the blob changed meanwhile, and return whether they were stored
+    """
+    with transaction.atomic():
+        updated = ImageBlob.objects.filter(
+            pk=blob.pk, image=original
+        ).update(**fields)
+        if not updated:
+            return False
+
+        business_fields = {'image_status': fields['status']}
+        if 'image' in fields:
+            business_fields['image'] = fields['image']
+            business_fields['thumbnail'] = fields['thumbnail']
+        businesses = Business.objects.filter(image_blob=blob)
+        rows = list(businesses.values_list('pk', 'user_id'))
+        businesses.update(**business_fields)
+        for user_id in {user_id for _, user_id in rows}:
+            bump_for_model(Business, user_id)
+        representation_cache.bump(Business, [pk for pk, _ in rows])
+    return True
+
+
+def schedule(blob):
+    """
+    Process a newly stored blob on the pool once the upload commits, or
+    immediately when IMAGE_PIPELINE['EAGER'] is set
+    """
+    if pipeline_options()['EAGER']:
+        process_blob(blob.pk)
+        return
+    transaction.on_commit(lambda: submit(blob.pk))
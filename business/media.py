@@ -0,0 +1,153 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+# Transfer backends a front server can take a file over with
+SENDFILE_HEADERS = {
+    'x-sendfile': 'X-Sendfile',
+    'x-accel-redirect': 'X-Accel-Redirect',
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_options():
+    """ Return MEDIA_SERVING merged over the defaults """
+    options = {
+        'SENDFILE': None,
+        'ACCEL_PREFIX': '/protected-media/',
+        'MAX_AGE': 60 * 60,
+    }
+    options.update(getattr(settings, 'MEDIA_SERVING', {}))
+    return options
+
+
+def parse_range(header, size):
+    """
+    Return the (start, end) byte offsets, end inclusive, named by a Range
+    header of one range, or None when it is absent, malformed or names
+    several ranges, which are then answered with the whole file. Raises
+    ValueError for a range lying past the end of the file.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if size == 0:
+        raise ValueError(header)
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the final `last` bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+class RangeFile:
+    """ Read only `length` bytes of an open file, from `start` on """
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def serve_media(request, name):
+    """
+    Serve the stored media file `name` with ETag/Last-Modified
+    validation and single byte ranges, handing the transfer to the
+    front server when MEDIA_SERVING['SENDFILE'] names one
+    """
+    options = media_options()
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    stat = os.stat(path)
+    etag = f'"{int(stat.st_mtime_ns):x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        content_type = mimetypes.guess_type(name)[0] or \
+            'application/octet-stream'
+        backend = options['SENDFILE']
+        if backend:
+            response = sendfile_response(backend, options, path, name,
+                                         content_type)
+        else:
+            response = file_response(request, path, stat.st_size, etag,
+                                     last_modified, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = f'private, max-age={options["MAX_AGE"]}'
+    return response
+
+
+def sendfile_response(backend, options, path, name, content_type):
+    """
+    Return an empty response telling the front server which file to
+    send; it answers byte ranges of that file itself
+    """
+    response = HttpResponse(content_type=content_type)
+    if backend == 'x-accel-redirect':
+        response[SENDFILE_HEADERS[backend]] = \
+            options['ACCEL_PREFIX'] + quote(name)
+    else:
+        response[SENDFILE_HEADERS[backend]] = path
+    return response
+
+
+def file_response(request, path, size, etag, last_modified, content_type):
+    """
+    Stream a file, or the byte range requested of it. Whole files go
+    through FileResponse so WSGI servers can use their file wrapper.
+    """
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None or if_range == etag or \
+            parse_http_date_safe(if_range) == last_modified:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    f = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(f, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            RangeFile(f, start, end - start + 1), content_type=content_type,
+            status=206
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,83 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework.response import Response
+
+from business.cache import response_cache
+from business.versions import get_version
+
+
+class ConditionalGetMixin:
+    """
+    Answer reads with an ETag derived from the user's collection version,
+    replying 304 before the queryset is built when unchanged and serving
+    repeat reads from the response cache. No Last-Modified is sent: two
+    changes within one second would share it, and If-Modified-Since would
+    then confirm a stale copy.
+    """
+    version_collection = None
+    cache_responses = True
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        """ Return 304 if the client copy is current, else call handler """
+        version = get_version(self.version_collection, request.user.pk)
+        digest = self.get_representation_digest(request, version)
+        etag = f'"{digest}"'
+
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None and self.cache_responses:
+            response = response_cache.fetch(
+                f'{self.action}:{digest}',
+                lambda: handler(request, *args, **kwargs)
+            )
+        elif response is None:
+            response = handler(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def get_representation_digest(self, request, version):
+        """ Return a digest identifying this representation at version """
+        # Bodies carry absolute URLs, so the origin is part of the key
+        raw = ':'.join([
+            str(version),
+            str(request.user.pk),
+            f'{request.scheme}://{request.get_host()}',
+            request.get_full_path(),
+            request.accepted_media_type or '',
+        ])
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+class BulkCreateMixin:
+    """ Accept a JSON array on create to create many objects at once """
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'create' and isinstance(kwargs.get('data'), list):
+            kwargs['many'] = True
+            kwargs['allow_empty'] = False
+        return super().get_serializer(*args, **kwargs)
+
+
+class FastListMixin:
+    """
+    Serve list actions through a FastListSerializer built on values()
+    rows instead of instantiating a ModelSerializer per row. This is the
+    only list path: it is faster than multi-getting rows from the
+    representation cache, which serves detail and write responses.
+    """
+    fast_list_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_list_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        fast = self.fast_list_serializer
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*fast.fields)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast.represent(page))
+        return Response(fast.represent(rows))
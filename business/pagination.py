@@ -0,0 +1,203 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the ordering columns instead of using
+    OFFSET, so every page costs the same as the first one.
+
+    Pagination is opt-in: it is applied only when the client sends a
+    `cursor` or `page_size` query parameter, so existing clients keep
+    receiving plain lists.
+    """
+    ordering = ('-id',)
+    page_size = 100
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """ Return a single page of rows, or None when not requested """
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.clean_position(queryset.model, position)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._flip(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek(position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = rows
+        return rows
+
+    def is_requested(self, request):
+        """ Return True if the client asked for a paginated response """
+        return (
+            self.cursor_query_param in request.query_params or
+            self.page_size_query_param in request.query_params
+        )
+
+    def get_page_size(self, request):
+        """ Return the page size requested by the client, within bounds """
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        """ Return the link to the page after the current one """
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        """ Return the link to the page before the current one """
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        """ Return the (position, reverse) pair encoded in the cursor """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii'))
+            cursor = json.loads(raw.decode('utf-8'))
+            position = cursor['p']
+            reverse = bool(cursor.get('r', False))
+        except (TypeError, ValueError, KeyError, UnicodeError,
+                binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def clean_position(self, model, position):
+        """
+        Convert the decoded cursor values to their ordering fields' types,
+        raising NotFound for values the fields cannot hold
+        """
+        ranges = BaseDatabaseOperations.integer_field_ranges
+        cleaned = []
+        for name, value in zip(self.ordering, position):
+            if value is None or isinstance(value, (list, dict)):
+                raise NotFound(self.invalid_cursor_message)
+            field = model._meta.get_field(name.lstrip('-'))
+            try:
+                value = field.to_python(value)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            # Integers past the column's range overflow in the database
+            low, high = ranges.get(field.get_internal_type(), (None, None))
+            if low is not None and not low <= value <= high:
+                raise NotFound(self.invalid_cursor_message)
+            cleaned.append(value)
+        return cleaned
+
+    def encode_cursor(self, position, reverse):
+        """ Return an opaque cursor for the given position """
+        cursor = {'p': position}
+        if reverse:
+            cursor['r'] = 1
+        raw = json.dumps(cursor, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    def get_position(self, row):
+        """ Return the ordering values of a model instance or values() row """
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(row, dict):
+            return [row[name] for name in names]
+        return [getattr(row, name) for name in names]
+
+    def _link(self, row, reverse):
+        cursor = self.encode_cursor(self.get_position(row), reverse)
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def _seek(self, position, reverse):
+        """ Build the filter selecting rows strictly after a position """
+        clauses = []
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = f'{name}__lt' if descending else f'{name}__gt'
+            equal = {
+                other.lstrip('-'): value
+                for other, value in zip(self.ordering[:index], position)
+            }
+            clauses.append(Q(**equal) & Q(**{lookup: position[index]}))
+        return reduce(or_, clauses)
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class BusinessPagination(KeysetPagination):
+    """ Keyset pagination for businesses, newest first """
+    ordering = ('-id',)
+
+
+class AttrPagination(KeysetPagination):
+    """ Keyset pagination for tags and tasks, by name then id """
+    ordering = ('-name', 'id')
@@ -1,30 +1,89 @@
+from django.db import models, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 
-from api.models import Tag, Task, Business
+from api.bulk import BATCH_SIZE, bulk_insert
+from api.serializers import CachedFieldsMixin
+from api.models import Tag, Task, Business, UploadSession
+from business import images
+from business.cache import representation_cache
+from business.fields import UserPrimaryKeyRelatedField
+from business.filters import MATCH_ALL, MATCH_ANY
+from business.uploads import upload_options
+from business.variants import image_version
+from business.versions import bump_for_model
 
-class TagSerializer(serializers.ModelSerializer):
+
+class BulkCreateListSerializer(serializers.ListSerializer):
+    """ List serializer writing every item in one bulk insert """
+    def create(self, validated_data):
+        """ Create all objects in a single transaction """
+        model = self.child.Meta.model
+        objs = [model(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            bulk_insert(model, objs)
+            for user_id in {obj.user_id for obj in objs}:
+                bump_for_model(model, user_id)
+        return objs
+
+
+class CachedRepresentationListSerializer(serializers.ListSerializer):
+    """
+    List serializer reading all rows from the representation cache. List
+    endpoints use FastListMixin instead; this serves many=True responses
+    such as the result of a bulk create.
+    """
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        if isinstance(iterable, models.QuerySet):
+            # Relations are loaded by the child for cache misses only
+            iterable = iterable.prefetch_related(None)
+        return representation_cache.represent_many(self.child, list(iterable))
+
+
+class CachedRepresentationMixin:
+    """ Serve to_representation from the representation cache """
+    related_lookups = ()
+
+    def to_representation(self, instance):
+        return representation_cache.represent_many(self, [instance])[0]
+
+    def to_representation_uncached(self, instance):
+        """ Serialize instance without consulting the cache """
+        return super().to_representation(instance)
+
+    def load_related(self, instances):
+        """ Load the relations used by to_representation in bulk """
+        prefetch_related_objects(instances, *self.related_lookups)
+
+
+class TagSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """ Serializer for tag objects """
     class Meta:
         model=Tag
         fields = ('id', 'name',)
         read_only_fields = ('id',)
+        list_serializer_class = BulkCreateListSerializer
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """ Serializer for task objects """
     class Meta:
         model = Task
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = BulkCreateListSerializer
 
 
-class BusinessSerializer(serializers.ModelSerializer):
+class BusinessSerializer(CachedRepresentationMixin,
+                         CachedFieldsMixin,
+                         serializers.ModelSerializer):
     """ Serializer for business objects"""
-    tag = serializers.PrimaryKeyRelatedField(
+    tag = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
-    task = serializers.PrimaryKeyRelatedField(
+    task = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Task.objects.all()
     )
@@ -33,17 +92,152 @@ class BusinessSerializer(serializers.ModelSerializer):
         model = Business
         fields = ('id', 'title', 'tag', 'task',)
         read_only_fields = ('id',)
+        list_serializer_class = CachedRepresentationListSerializer
+
+    related_lookups = (
+        Prefetch('tag', queryset=Tag.objects.only('id').order_by('id')),
+        Prefetch('task', queryset=Task.objects.only('id').order_by('id')),
+    )
+
+
+class BulkBusinessListSerializer(serializers.ListSerializer):
+    """ List serializer creating many businesses and their links at once """
+    relations = ('tag', 'task')
+
+    def to_internal_value(self, data):
+        """ Validate the items, resolving all their tags/tasks at once """
+        if isinstance(data, list):
+            for field in self.relations:
+                self.child.fields[field].prefetch(
+                    item.get(field) for item in data
+                    if isinstance(item, dict) and item.get(field) is not None
+                )
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        """ Insert businesses and their tag/task links in one transaction """
+        links = {field: [] for field in self.relations}
+        objs = []
+        for attrs in validated_data:
+            for field in self.relations:
+                links[field].append([obj.pk for obj in attrs.pop(field, [])])
+            objs.append(Business(**attrs))
+
+        with transaction.atomic():
+            bulk_insert(Business, objs)
+            for field in self.relations:
+                through = Business._meta.get_field(field).remote_field.through
+                through.objects.bulk_create([
+                    through(business_id=obj.id, **{f'{field}_id': pk})
+                    for obj, pks in zip(objs, links[field])
+                    for pk in pks
+                ], batch_size=BATCH_SIZE)
+            for user_id in {obj.user_id for obj in objs}:
+                bump_for_model(Business, user_id)
+            representation_cache.bump(Business, [obj.pk for obj in objs])
+        return objs
+
+    def to_representation(self, data):
+        """ Represent the created businesses like BusinessSerializer """
+        return BusinessSerializer(data, many=True, context=self.context).data
+
+
+class BusinessBulkSerializer(CachedFieldsMixin,
+                             serializers.ModelSerializer):
+    """ Serializer for one business of a bulk create """
+    tag = UserPrimaryKeyRelatedField(
+        many=True,
+        queryset=Tag.objects.all(),
+        required=False
+    )
+    task = UserPrimaryKeyRelatedField(
+        many=True,
+        queryset=Task.objects.all(),
+        required=False
+    )
+
+    class Meta:
+        model = Business
+        fields = ('id', 'title', 'tag', 'task',)
+        read_only_fields = ('id',)
+        list_serializer_class = BulkBusinessListSerializer
 
 
 class BusinessDetailSerializer(BusinessSerializer):
     """ Serializer for a business detail """
     tag = TagSerializer(many=True, read_only=True)
     task = TaskSerializer(many=True, read_only=True)
+    image_version = serializers.SerializerMethodField()
+
+    class Meta(BusinessSerializer.Meta):
+        fields = (
+            'id', 'title', 'tag', 'task', 'image', 'image_status', 'thumbnail',
+            'image_version',
+        )
+        read_only_fields = ('id', 'image', 'image_status', 'thumbnail',)
+
+    related_lookups = ('tag', 'task')
+
+    def get_image_version(self, obj):
+        """ Return the token that makes resized image URLs cacheable """
+        return image_version(obj.image) if obj.image else None
+
+
+class BusinessSearchSerializer(serializers.Serializer):
+    """ Serializer for the tag/task filter of a business search """
+    tag = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+    task = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+    match = serializers.ChoiceField(
+        choices=(MATCH_ANY, MATCH_ALL),
+        default=MATCH_ANY
+    )
 
 
-class BusinessImageSerializer(serializers.ModelSerializer):
+class BusinessImageSerializer(CachedFieldsMixin,
+                              serializers.ModelSerializer):
     """ Serializer for uploading images to busines """
+    # Only the header is checked here; decoding happens off-request
+    image = serializers.FileField()
+
     class Meta:
         model = Business
-        fields = ('id', 'image',)
-        read_only_fields = ('id',)
\ No newline at end of file
+        fields = ('id', 'image', 'image_status', 'thumbnail',)
+        read_only_fields = ('id', 'image_status', 'thumbnail',)
+
+    def validate_image(self, value):
+        """ Check the upload is an accepted image format """
+        if images.identify(value) is None:
+            raise serializers.ValidationError(
+                'Upload a valid image. The file you uploaded was either '
+                'not an image or a corrupted image.'
+            )
+        return value
+
+    def update(self, instance, validated_data):
+        """ Store the upload, sharing the blob of identical content """
+        return images.store_image(instance, validated_data['image'])
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """ Serializer for resumable business image uploads """
+    offset = serializers.IntegerField(source='received', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'filename', 'size', 'offset', 'created_at',)
+        read_only_fields = ('id', 'created_at',)
+
+    def validate_size(self, value):
+        """ Check the declared size is within the upload limit """
+        max_bytes = upload_options()['MAX_BYTES']
+        if not 0 < value <= max_bytes:
+            raise serializers.ValidationError(
+                f'Ensure the size is between 1 and {max_bytes} bytes.'
+            )
+        return value
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete,
+)
+from django.dispatch import receiver
+
+from api.models import Business, ImageBlob, Tag, Task
+from business.cache import representation_cache
+from business.filters import link_model
+from business.versions import BUSINESS, TAGS, TASKS, bump_for_model, bump_versions
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Business)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Business)
+def object_changed(sender, instance, **kwargs):
+    """ Bump the owner's collection versions when an object changes """
+    bump_for_model(sender, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Business.tag.through)
+@receiver(m2m_changed, sender=Business.task.through)
+def links_changed(sender, instance, action, **kwargs):
+    """ Bump the owner's collection versions when business links change """
+    if action.startswith('post_'):
+        bump_for_model(sender, instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_created(sender, instance, created, **kwargs):
+    """ Start a new user's collections at a fresh version """
+    if created:
+        bump_versions(instance.pk, (BUSINESS, TAGS, TASKS))
+
+
+@receiver(post_save, sender=Business)
+@receiver(post_delete, sender=Business)
+def business_changed(sender, instance, **kwargs):
+    """ Evict the cached representations of a saved or deleted business """
+    representation_cache.bump(Business, [instance.pk])
+
+
+@receiver(post_delete, sender=Business)
+def business_deleted(sender, instance, **kwargs):
+    """ Release a deleted business's reference to its image blob """
+    if instance.image_blob_id is not None:
+        ImageBlob.objects.filter(pk=instance.image_blob_id).update(
+            refcount=F('refcount') - 1
+        )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Task)
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Task)
+def attr_changed(sender, instance, created=False, **kwargs):
+    """ Evict the cached businesses nesting a renamed or deleted tag/task """
+    if created:
+        return
+    field = 'tag' if sender is Tag else 'task'
+    business_ids = link_model(field).objects.filter(
+        **{f'{field}_id': instance.pk}
+    ).values_list('business_id', flat=True)
+    representation_cache.bump(Business, business_ids)
+
+
+@receiver(m2m_changed, sender=Business.tag.through)
+@receiver(m2m_changed, sender=Business.task.through)
+def business_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """ Evict the cached representations of relinked businesses """
+    if not reverse:
+        if action.startswith('post_'):
+            representation_cache.bump(Business, [instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        representation_cache.bump(Business, pk_set)
+    elif action == 'pre_clear':
+        field = 'tag' if isinstance(instance, Tag) else 'task'
+        representation_cache.bump(Business, link_model(field).objects.filter(
+            **{f'{field}_id': instance.pk}
+        ).values_list('business_id', flat=True))
@@ -4,7 +4,9 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import serializers, status
@@ -14,6 +16,7 @@ from api.models import Business, Tag, Task
 from business.serializers import BusinessSerializer, BusinessDetailSerializer
 
 BUSINESS_URL = reverse('business:business-list')
+SEARCH_URL = reverse('business:business-search')
 
 def image_upload_url(business_id):
     """ Return URL for business image upload """
@@ -104,6 +107,37 @@ class PrivateBusinessApiTests(TestCase):
         serializer = BusinessDetailSerializer(business)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_business_query_count_constant(self):
+        """ Test listing businesses does not query per row """
+        tag = sample_tag(user=self.user)
+        task = sample_task(user=self.user)
+        for i in range(5):
+            business = sample_business(user=self.user, title=f'sales {i}')
+            business.tag.add(tag)
+            business.task.add(task)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(BUSINESS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 5)
+        self.assertEqual(res.data[0]['tag'], [tag.id])
+        self.assertEqual(res.data[0]['task'], [task.id])
+
+    def test_view_business_detail_query_count(self):
+        """ Test retrieving a business loads its relations in bulk """
+        business = sample_business(user=self.user)
+        business.tag.add(sample_tag(user=self.user))
+        business.tag.add(sample_tag(user=self.user, name='order management'))
+        business.task.add(sample_task(user=self.user))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(business.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tag']), 2)
+        self.assertEqual(len(res.data['task']), 1)
+
     def test_create_basic_business(self):
         """ Test creating business """
         payload = {
@@ -155,6 +189,172 @@ class PrivateBusinessApiTests(TestCase):
         self.assertIn(task1, tasks)
         self.assertIn(task2, tasks)
 
+    def test_create_business_with_many_tags_query_count(self):
+        """ Test submitted tags are resolved with a single query """
+        tags = [sample_tag(user=self.user, name=f'tag {i}') for i in range(3)]
+        tasks = [sample_task(user=self.user, name=f'task {i}') for i in range(3)]
+        payload = {
+            'title': 'sales',
+            'tag': [tag.id for tag in tags],
+            'task': [task.id for task in tasks],
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(BUSINESS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        lookups = [
+            query for query in queries
+            if query['sql'].startswith('SELECT "api_tag"')
+            and 'INNER JOIN' not in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+
+    def test_create_business_with_foreign_tags(self):
+        """ Test tags of another user are rejected together """
+        user2 = get_user_model().objects.create_user(
+            'user2@email.com',
+            'Password123'
+        )
+        foreign1 = sample_tag(user=user2)
+        foreign2 = sample_tag(user=user2, name='warehouse')
+        own = sample_tag(user=self.user)
+        payload = {
+            'title': 'sales',
+            'tag': [own.id, foreign1.id, foreign2.id, 999999],
+        }
+        res = self.client.post(BUSINESS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tag']), 3)
+        self.assertFalse(Business.objects.exists())
+
+    def test_bulk_create_businesses(self):
+        """ Test creating many businesses with their links in one request """
+        tag = sample_tag(user=self.user)
+        task = sample_task(user=self.user)
+        payload = [
+            {'title': 'sales', 'tag': [tag.id], 'task': [task.id]},
+            {'title': 'order management', 'tag': [tag.id, tag.id]},
+            {'title': 'warehouse'},
+        ]
+        res = self.client.post(BUSINESS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        self.assertEqual(res.data[0]['tag'], [tag.id])
+        self.assertEqual(res.data[0]['task'], [task.id])
+        self.assertEqual(res.data[2]['tag'], [])
+        business = Business.objects.get(id=res.data[1]['id'])
+        self.assertEqual(list(business.tag.all()), [tag])
+
+    def test_bulk_create_businesses_rejects_foreign_tags(self):
+        """ Test tags owned by another user are reported per item """
+        user2 = get_user_model().objects.create_user(
+            'user2@email.com',
+            'Password123'
+        )
+        foreign = sample_tag(user=user2)
+        payload = [
+            {'title': 'sales'},
+            {'title': 'order management', 'tag': [foreign.id]},
+        ]
+        res = self.client.post(BUSINESS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('tag', res.data[1])
+        self.assertFalse(Business.objects.exists())
+
+    def test_bulk_create_resolves_links_once(self):
+        """ Test tags/tasks of all items are looked up together """
+        tag = sample_tag(user=self.user)
+        task = sample_task(user=self.user)
+
+        def count_queries(items):
+            payload = [
+                {'title': f'business {i}', 'tag': [tag.id], 'task': [task.id]}
+                for i in range(items)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(BUSINESS_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        self.assertEqual(count_queries(2), count_queries(20))
+
+    def test_update_with_array_rejected(self):
+        """ Test PUT and PATCH with a JSON array are a normal 400 """
+        business = sample_business(user=self.user)
+        payload = [{'title': 'warehouse'}]
+
+        for method in (self.client.put, self.client.patch):
+            res = method(detail_url(business.id), payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('non_field_errors', res.data)
+        business.refresh_from_db()
+        self.assertEqual(business.title, 'sales')
+
+    def test_filter_business_match_any_unique(self):
+        """ Test a business matching several tags is returned once """
+        tag1 = sample_tag(user=self.user, name='sales manager')
+        tag2 = sample_tag(user=self.user, name='order management officer')
+        business = sample_business(user=self.user)
+        business.tag.add(tag1, tag2)
+
+        res = self.client.get(BUSINESS_URL, {'tag': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in res.data], [business.id])
+
+    def test_filter_business_match_all(self):
+        """ Test match=all keeps businesses linked to every tag """
+        tag1 = sample_tag(user=self.user, name='sales manager')
+        tag2 = sample_tag(user=self.user, name='order management officer')
+        business1 = sample_business(user=self.user, title='butter')
+        business1.tag.add(tag1, tag2)
+        business2 = sample_business(user=self.user, title='skim milk')
+        business2.tag.add(tag1)
+
+        res = self.client.get(
+            BUSINESS_URL,
+            {'tag': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        )
+
+        self.assertEqual([row['id'] for row in res.data], [business1.id])
+
+    def test_filter_business_invalid_params(self):
+        """ Test malformed ids and unknown match modes are rejected """
+        res = self.client.get(BUSINESS_URL, {'tag': 'a,b'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(BUSINESS_URL, {'tag': '1', 'match': 'some'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_business_with_body(self):
+        """ Test searching with a large id list sent in the body """
+        tag = sample_tag(user=self.user)
+        task1 = sample_task(user=self.user, name='finding a new customer')
+        task2 = sample_task(user=self.user, name='analysing sales trends')
+        business1 = sample_business(user=self.user, title='butter')
+        business1.tag.add(tag)
+        business1.task.add(task1, task2)
+        business2 = sample_business(user=self.user, title='skim milk')
+        business2.task.add(task1)
+
+        payload = {
+            'tag': [tag.id] + list(range(100000, 102000)),
+            'task': [task1.id, task2.id],
+        }
+        res = self.client.post(SEARCH_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, BusinessSerializer([business1], many=True).data)
+
+        payload = {'task': [task1.id, task2.id], 'match': 'all'}
+        res = self.client.post(SEARCH_URL, payload, format='json')
+        self.assertEqual([row['id'] for row in res.data], [business1.id])
+
     def test_partial_update_business(self):
         """ Test updating a business with patch """
         business = sample_business(user=self.user)
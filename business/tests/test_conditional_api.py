@@ -0,0 +1,209 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Business, Tag, Task
+from business.cache import response_cache
+from business.checks import check_version_cache
+
+
+BUSINESS_URL = reverse('business:business-list')
+TAG_URL = reverse('business:tag-list')
+TASK_URL = reverse('business:task-list')
+
+
+def detail_url(business_id):
+    """ Return business detail URL """
+    return reverse('business:business-detail', args=[business_id])
+
+
+class ConditionalGetApiTests(TestCase):
+    """ Test ETag based conditional requests on the business api """
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_list_not_modified(self):
+        """ Test polling an unchanged list returns 304 without queries """
+        Tag.objects.create(user=self.user, name='Sales')
+        res = self.client.get(TAG_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etag = res['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_create_changes_etag(self):
+        """ Test creating an object invalidates the collection ETag """
+        etag = self.client.get(TASK_URL)['ETag']
+        self.client.post(TASK_URL, {'name': 'invoicing'})
+
+        res = self.client.get(TASK_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_bulk_create_changes_etag(self):
+        """ Test bulk creation invalidates the collection ETag """
+        etag = self.client.get(TAG_URL)['ETag']
+        self.client.post(TAG_URL, [{'name': 'Sales'}], format='json')
+
+        res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_link_change_changes_etags(self):
+        """ Test linking a tag invalidates business and tag lists """
+        business = Business.objects.create(user=self.user, title='sales')
+        tag = Tag.objects.create(user=self.user, name='Sales')
+        business_etag = self.client.get(detail_url(business.id))['ETag']
+        tag_etag = self.client.get(TAG_URL, {'assigned_only': 1})['ETag']
+
+        business.tag.add(tag)
+
+        res = self.client.get(
+            detail_url(business.id), HTTP_IF_NONE_MATCH=business_etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(
+            TAG_URL, {'assigned_only': 1}, HTTP_IF_NONE_MATCH=tag_etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_rename_tag_changes_business_etag(self):
+        """ Test renaming a tag invalidates business details nesting it """
+        business = Business.objects.create(user=self.user, title='sales')
+        task = Task.objects.create(user=self.user, name='invoicing')
+        business.task.add(task)
+        etag = self.client.get(detail_url(business.id))['ETag']
+
+        task.name = 'billing'
+        task.save()
+
+        res = self.client.get(detail_url(business.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['task'][0]['name'], 'billing')
+
+    def test_etag_differs_per_query(self):
+        """ Test different filters of one collection get different ETags """
+        etag1 = self.client.get(BUSINESS_URL)['ETag']
+        etag2 = self.client.get(BUSINESS_URL, {'tag': '1'})['ETag']
+        self.assertNotEqual(etag1, etag2)
+
+    def test_other_user_change_keeps_etag(self):
+        """ Test another user's writes do not invalidate this user's lists """
+        etag = self.client.get(TAG_URL)['ETag']
+        user2 = get_user_model().objects.create_user(
+            'user2@email.com',
+            'Password123'
+        )
+        Tag.objects.create(user=user2, name='Warehouse')
+
+        res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ResponseCacheApiTests(TestCase):
+    """ Test the per-user response cache of the business api """
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_repeat_read_served_from_cache(self):
+        """ Test a repeated read is answered without database queries """
+        business = Business.objects.create(user=self.user, title='sales')
+        first = self.client.get(BUSINESS_URL)
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            res = self.client.get(BUSINESS_URL)
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(res.data, first.data)
+        self.assertEqual(res.data[0]['id'], business.id)
+        self.assertEqual(response_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_write_invalidates_cached_response(self):
+        """ Test a write is visible on the next read """
+        business = Business.objects.create(user=self.user, title='sales')
+        self.client.get(detail_url(business.id))
+        self.client.patch(detail_url(business.id), {'title': 'warehouse'})
+
+        res = self.client.get(detail_url(business.id))
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['title'], 'warehouse')
+
+    def test_cache_is_per_user(self):
+        """ Test one user's cached response is never served to another """
+        Tag.objects.create(user=self.user, name='Sales')
+        self.client.get(TAG_URL)
+
+        user2 = get_user_model().objects.create_user(
+            'user2@email.com',
+            'Password123'
+        )
+        self.client.force_authenticate(user2)
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data, [])
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'api.example.com'])
+    def test_cache_is_per_origin(self):
+        """ Test a response cached for one host is not served to another """
+        business = Business.objects.create(
+            user=self.user, title='sales', image='uploads/business/photo.jpg'
+        )
+        self.client.get(detail_url(business.id))
+
+        res = self.client.get(
+            detail_url(business.id), HTTP_HOST='api.example.com', secure=True
+        )
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertTrue(
+            res.data['image'].startswith('https://api.example.com/')
+        )
+
+    def test_if_modified_since_not_trusted(self):
+        """ Test a date validator never confirms a copy as current """
+        Tag.objects.create(user=self.user, name='Sales')
+        res = self.client.get(TAG_URL)
+        self.assertNotIn('Last-Modified', res)
+
+        Tag.objects.create(user=self.user, name='Support')
+        res = self.client.get(
+            TAG_URL, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 2)
+
+    @override_settings(COLLECTION_VERSION_CACHE={'CACHE_ALIAS': 'default'})
+    def test_per_process_version_cache_refused(self):
+        """ Test a per-process version cache fails the system check """
+        errors = check_version_cache(None)
+        self.assertEqual([error.id for error in errors], ['business.E001'])
+
+    @override_settings(COLLECTION_VERSION_CACHE={'CACHE_ALIAS': 'default'})
+    def test_writes_succeed_with_per_process_version_cache(self):
+        """ Test a misconfigured cache never fails a write already saved """
+        res = self.client.post(TAG_URL, {'name': 'Sales'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
@@ -0,0 +1,130 @@
+import gzip
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Business, Tag, Task
+
+
+EXPORT_URL = reverse('business:business-export')
+
+
+def read_lines(response):
+    return [
+        json.loads(line)
+        for line in b''.join(response.streaming_content).splitlines()
+    ]
+
+
+class PublicExportApiTests(TestCase):
+    """ Test the export is login required """
+    def test_login_required(self):
+        res = APIClient().get(EXPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateExportApiTests(TestCase):
+    """ Test the streaming NDJSON export """
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.tag = Tag.objects.create(user=self.user, name='Sales')
+        self.task = Task.objects.create(user=self.user, name='Invoice')
+        self.business = Business.objects.create(user=self.user, title='shop')
+        self.business.tag.add(self.tag)
+        self.business.task.add(self.task)
+        Business.objects.create(user=self.user, title='empty')
+
+    def test_export_graph(self):
+        """ Test tags, tasks and businesses are streamed in order """
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = read_lines(res)
+        self.assertEqual([line['type'] for line in lines],
+                         ['tag', 'task', 'business', 'business'])
+        self.assertEqual(lines[0], {
+            'type': 'tag', 'id': self.tag.id, 'name': 'Sales'
+        })
+        self.assertEqual(lines[2], {
+            'type': 'business',
+            'id': self.business.id,
+            'title': 'shop',
+            'tag': [self.tag.id],
+            'task': [self.task.id],
+        })
+        self.assertEqual(lines[3]['tag'], [])
+
+    def test_export_excludes_other_users(self):
+        """ Test only the authenticated user's rows are exported """
+        other = get_user_model().objects.create_user(
+            'other@email.com',
+            'Password123'
+        )
+        Tag.objects.create(user=other, name='Other')
+        Business.objects.create(user=other, title='other')
+
+        lines = read_lines(self.client.get(EXPORT_URL))
+
+        self.assertNotIn('Other', [line.get('name') for line in lines])
+        self.assertNotIn('other', [line.get('title') for line in lines])
+
+    def test_export_filtered(self):
+        """ Test the list tag/task filters restrict exported businesses """
+        lines = read_lines(self.client.get(EXPORT_URL, {'tag': self.tag.id}))
+        titles = [line['title'] for line in lines if line['type'] == 'business']
+        self.assertEqual(titles, ['shop'])
+
+    def test_export_gzip(self):
+        """ Test the stream is gzipped when the client accepts it """
+        plain = b''.join(self.client.get(EXPORT_URL).streaming_content)
+
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        body = gzip.decompress(b''.join(res.streaming_content))
+        self.assertEqual(body, plain)
+
+    def test_export_gzip_refused(self):
+        """ Test gzip is not used when the client gives it q=0 """
+        for accept_encoding in ('gzip;q=0', 'br, gzip; q=0.0', '*;q=0'):
+            res = self.client.get(
+                EXPORT_URL, HTTP_ACCEPT_ENCODING=accept_encoding
+            )
+
+            self.assertFalse(res.has_header('Content-Encoding'))
+            self.assertIn('Accept-Encoding', res['Vary'])
+
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='br;q=1, *')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+
+    @override_settings(BUSINESS_EXPORT={'CHUNK_SIZE': 2})
+    def test_export_chunked(self):
+        """ Test links are loaded once per chunk across many chunks """
+        for i in range(5):
+            business = Business.objects.create(user=self.user, title=f'b{i}')
+            business.tag.add(self.tag)
+
+        res = self.client.get(EXPORT_URL)
+        # One cursor per model, then 2 link queries per chunk of businesses
+        with self.assertNumQueries(3 + 4 * 2):
+            lines = read_lines(res)
+
+        businesses = [line for line in lines if line['type'] == 'business']
+        self.assertEqual(len(businesses), 7)
+        self.assertEqual(
+            sum(line['tag'] == [self.tag.id] for line in businesses), 6
+        )
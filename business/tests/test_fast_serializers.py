@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.models import Business, Tag, Task
+from business.fast import AttrFastSerializer, BusinessFastSerializer
+from business.serializers import (
+    BusinessSerializer,
+    TagSerializer,
+    TaskSerializer,
+)
+
+
+BUSINESS_URL = reverse('business:business-list')
+TAGS_URL = reverse('business:tag-list')
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class FastSerializerEquivalenceTests(TestCase):
+    """ Test the fast list serializers render the same bytes """
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        names = ['Sales', 'Zoë', '"quoted"', 'emoji \U0001f680', '']
+        self.tags = [Tag.objects.create(user=self.user, name=n) for n in names]
+        self.tasks = [
+            Task.objects.create(user=self.user, name=n) for n in names[:3]
+        ]
+
+        empty = Business.objects.create(user=self.user, title='empty')
+        linked = Business.objects.create(user=self.user, title='linked é')
+        # Link in reverse id order so any insertion-order leak shows up
+        linked.tag.add(*reversed(self.tags))
+        linked.task.add(self.tasks[2], self.tasks[0])
+        partial = Business.objects.create(user=self.user, title='partial')
+        partial.task.add(self.tasks[1])
+        self.businesses = [empty, linked, partial]
+
+    def test_tags_match(self):
+        """ Test tag rows render identically to TagSerializer """
+        queryset = Tag.objects.order_by('-name', 'id')
+        fast = AttrFastSerializer().represent(
+            queryset.values(*AttrFastSerializer.fields)
+        )
+        self.assertEqual(
+            render(fast), render(TagSerializer(queryset, many=True).data)
+        )
+
+    def test_tasks_match(self):
+        """ Test task rows render identically to TaskSerializer """
+        queryset = Task.objects.order_by('-name', 'id')
+        fast = AttrFastSerializer().represent(
+            queryset.values(*AttrFastSerializer.fields)
+        )
+        self.assertEqual(
+            render(fast), render(TaskSerializer(queryset, many=True).data)
+        )
+
+    def test_businesses_match(self):
+        """ Test business rows render identically to BusinessSerializer """
+        queryset = Business.objects.order_by('-id')
+        fast = BusinessFastSerializer().represent(
+            queryset.values(*BusinessFastSerializer.fields)
+        )
+        expected = BusinessSerializer(queryset, many=True).data
+        self.assertEqual(render(fast), render(expected))
+
+    def test_empty_queryset(self):
+        """ Test an empty queryset renders as an empty list """
+        queryset = Business.objects.none()
+        fast = BusinessFastSerializer().represent(
+            queryset.values(*BusinessFastSerializer.fields)
+        )
+        self.assertEqual(
+            render(fast), render(BusinessSerializer(queryset, many=True).data)
+        )
+
+    def test_business_links_loaded_per_relation(self):
+        """ Test the links of a page are loaded with one query per relation """
+        rows = list(Business.objects.values(*BusinessFastSerializer.fields))
+        with self.assertNumQueries(2):
+            BusinessFastSerializer().represent(rows)
+
+    def test_list_endpoints_match(self):
+        """ Test list responses render the same bytes as the serializers """
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(BUSINESS_URL)
+        expected = BusinessSerializer(
+            Business.objects.order_by('-id'), many=True
+        ).data
+        self.assertEqual(res.content, render(expected))
+
+        res = client.get(TAGS_URL, {'page_size': 2})
+        expected = TagSerializer(
+            Tag.objects.order_by('-name', 'id')[:2], many=True
+        ).data
+        self.assertEqual(render(res.data['results']), render(expected))
+        self.assertIsNotNone(res.data['next'])
@@ -0,0 +1,287 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Business, ImageBlob
+from business import images
+
+
+def image_upload_url(business_id):
+    return reverse('business:business-upload-image', args=[business_id])
+
+
+def detail_url(business_id):
+    return reverse('business:business-detail', args=[business_id])
+
+
+def image_file(name='photo.jpg', size=(40, 20), mode='RGB', fmt='JPEG',
+               orientation=None):
+    """ Return an in-memory upload of a generated image """
+    img = Image.new(mode, size)
+    buffer = io.BytesIO()
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(buffer, format=fmt, exif=exif)
+    else:
+        img.save(buffer, format=fmt)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ImagePipelineTests(TestCase):
+    """ Test uploaded images are processed off the request """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.business = Business.objects.create(user=self.user, title='shop')
+
+    def _upload(self, upload):
+        return self.client.post(
+            image_upload_url(self.business.id), {'image': upload},
+            format='multipart'
+        )
+
+    def test_upload_queued_after_commit(self):
+        """ Test the request stores the original and queues processing """
+        with patch.object(images, 'get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                res = self._upload(image_file())
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.data['image_status'], Business.IMAGE_PENDING)
+            self.assertIsNone(res.data['thumbnail'])
+            get_executor.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        self.business.refresh_from_db()
+        get_executor.return_value.submit.assert_called_once_with(
+            images._run, self.business.image_blob_id
+        )
+
+    @override_settings(IMAGE_PIPELINE={'MAX_QUEUE': 2})
+    def test_queue_bounded(self):
+        """ Test jobs past MAX_QUEUE are turned away until one finishes """
+        with patch.object(images, '_queue_slots', None), \
+                patch.object(images, 'get_executor') as get_executor:
+            submit = get_executor.return_value.submit
+            self.assertTrue(images.submit(1))
+            self.assertTrue(images.submit(2))
+            self.assertFalse(images.submit(3))
+            self.assertEqual(submit.call_count, 2)
+
+            done = submit.return_value.add_done_callback.call_args[0][0]
+            done(submit.return_value)
+            self.assertTrue(images.submit(3))
+
+    @override_settings(IMAGE_PIPELINE={'EAGER': True})
+    def test_processed_image_ready(self):
+        """ Test processing re-encodes the image and adds a thumbnail """
+        self._upload(image_file(size=(1000, 500)))
+
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.image_status, Business.IMAGE_READY)
+        with Image.open(self.business.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (256, 128))
+
+        res = self.client.get(detail_url(self.business.id))
+        self.assertEqual(res.data['image_status'], Business.IMAGE_READY)
+        self.assertTrue(res.data['thumbnail'].endswith('.jpg'))
+
+    @override_settings(IMAGE_PIPELINE={'EAGER': True})
+    def test_exif_orientation_applied(self):
+        """ Test a rotated photo is stored upright """
+        self._upload(image_file(size=(40, 20), orientation=6))
+
+        self.business.refresh_from_db()
+        with Image.open(self.business.image.path) as img:
+            self.assertEqual(img.size, (20, 40))
+            self.assertNotIn(0x0112, img.getexif())
+
+    @override_settings(IMAGE_PIPELINE={'EAGER': True})
+    def test_transparent_image_kept_as_png(self):
+        """ Test images with alpha are re-encoded as PNG """
+        self._upload(image_file('logo.png', mode='RGBA', fmt='PNG'))
+
+        self.business.refresh_from_db()
+        self.assertTrue(self.business.image.name.endswith('.png'))
+        self.assertTrue(self.business.thumbnail.name.endswith('.png'))
+
+    @override_settings(IMAGE_PIPELINE={'EAGER': True})
+    def test_corrupt_image_failed(self):
+        """ Test an image that cannot be decoded is marked failed """
+        buffer = io.BytesIO()
+        Image.effect_noise((200, 200), 50).save(buffer, format='JPEG')
+        data = buffer.getvalue()
+        truncated = SimpleUploadedFile('photo.jpg', data[:len(data) // 2])
+
+        with self.assertLogs('business.images', 'WARNING'):
+            res = self._upload(truncated)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.image_status, Business.IMAGE_FAILED)
+
+    def test_non_image_rejected(self):
+        """ Test files that are not images are rejected in the request """
+        res = self._upload(SimpleUploadedFile('photo.jpg', b'not an image'))
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_replaced_image_not_overwritten(self):
+        """ Test a job for a replaced original discards its results """
+        self._upload(image_file())
+        self.business.refresh_from_db()
+        blob = self.business.image_blob
+
+        def replace_meanwhile(*args):
+            ImageBlob.objects.filter(pk=blob.pk).update(
+                image='uploads/blobs/other.jpg'
+            )
+            return 'jpg', b'data', b'thumb'
+
+        with patch.object(images, 'render', side_effect=replace_meanwhile):
+            images.process_blob(blob.pk)
+
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.image_status, Business.IMAGE_PENDING)
+        self.assertFalse(self.business.thumbnail)
+
+
+class ImageDedupTests(TestCase):
+    """ Test identical uploads share one stored and processed blob """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root,
+                                  IMAGE_PIPELINE={'EAGER': True})
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.businesses = [
+            Business.objects.create(user=self.user, title=f'shop {index}')
+            for index in range(2)
+        ]
+        self.data = image_file(size=(300, 200)).read()
+
+    def _upload(self, business, data=None):
+        upload = SimpleUploadedFile('logo.jpg', data or self.data)
+        return self.client.post(
+            image_upload_url(business.id), {'image': upload},
+            format='multipart'
+        )
+
+    def _files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media_root)
+            for root, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def test_identical_uploads_share_blob(self):
+        """ Test the same content is written and processed only once """
+        with patch.object(images, 'render', wraps=images.render) as render:
+            for business in self.businesses:
+                res = self._upload(business)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        render.assert_called_once()
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.digest, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(blob.status, ImageBlob.IMAGE_READY)
+        self.assertEqual(self._files(), sorted([
+            blob.image.name, blob.thumbnail.name
+        ]))
+        for business in self.businesses:
+            business.refresh_from_db()
+            self.assertEqual(business.image.name, blob.image.name)
+            self.assertEqual(business.image_status, Business.IMAGE_READY)
+
+    def test_replacing_image_releases_blob(self):
+        """ Test a new image moves the reference off the old blob """
+        self._upload(self.businesses[0])
+        other = image_file(size=(30, 30)).read()
+        self._upload(self.businesses[0], other)
+
+        old = ImageBlob.objects.get(digest=hashlib.sha256(self.data)
+                                    .hexdigest())
+        new = ImageBlob.objects.exclude(pk=old.pk).get()
+        self.assertEqual((old.refcount, new.refcount), (0, 1))
+
+    def test_stale_instance_releases_stored_blob(self):
+        """ Test the blob released is the one stored, not the one loaded """
+        business = self.businesses[0]
+        stale = Business.objects.get(pk=business.pk)
+        self._upload(business)
+        stored = ImageBlob.objects.get()
+        other = ImageBlob.objects.create(digest='f' * 64, refcount=0)
+
+        images.attach_blob(stale, other)
+
+        stored.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((stored.refcount, other.refcount), (0, 1))
+
+    def test_deleting_business_releases_blob(self):
+        """ Test deleting a business drops its reference """
+        for business in self.businesses:
+            self._upload(business)
+        self.businesses[0].refresh_from_db()
+        self.businesses[0].delete()
+
+        self.assertEqual(ImageBlob.objects.get().refcount, 1)
+
+    def test_upload_hashed_while_streaming(self):
+        """ Test the upload handlers hash the content as it arrives """
+        with patch.object(images, 'store_upload',
+                          wraps=images.store_upload) as store_upload:
+            self._upload(self.businesses[0])
+
+        upload = store_upload.call_args.args[0]
+        self.assertEqual(upload.content_digest,
+                         hashlib.sha256(self.data).hexdigest())
+
+    def test_garbage_collected_blob_not_reused(self):
+        """ Test an upload racing the collector stores the content again """
+        self._upload(self.businesses[0])
+        blob = ImageBlob.objects.get()
+        real_attach = images.attach_blob
+
+        def collect_first(business, found):
+            if found.pk == blob.pk:
+                ImageBlob.objects.filter(pk=blob.pk).delete()
+            return real_attach(business, found)
+
+        with patch.object(images, 'attach_blob', side_effect=collect_first):
+            self._upload(self.businesses[1])
+
+        self.businesses[1].refresh_from_db()
+        self.assertNotEqual(self.businesses[1].image_blob_id, blob.pk)
+        self.assertEqual(self.businesses[1].image_blob.refcount, 1)
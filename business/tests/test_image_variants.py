@@ -0,0 +1,190 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Business
+from business import views
+from business.variants import VariantCache, image_version
+
+
+def image_url(business_id):
+    return reverse('business:business-image', args=[business_id])
+
+
+def read(response):
+    content = b''.join(response.streaming_content)
+    response.close()
+    return content
+
+
+class ImageVariantApiTests(TestCase):
+    """ Test resized business images served from the variant cache """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(
+            MEDIA_ROOT=self.media_root,
+            IMAGE_VARIANTS={
+                'CACHE_DIR': os.path.join(self.media_root, 'variants'),
+                'WIDTHS': (100, 200),
+            }
+        )
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 300)).save(buffer, format='JPEG')
+        self.business = Business.objects.create(user=self.user, title='shop')
+        self.business.image.save('photo.jpg', ContentFile(buffer.getvalue()))
+
+    def test_variant_resized(self):
+        """ Test the image is scaled to the requested width and format """
+        res = self.client.get(
+            image_url(self.business.id), {'width': 100, 'format': 'webp'},
+            HTTP_ACCEPT='image/webp'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        self.assertEqual(res['Cache-Control'], 'private, no-cache')
+        with Image.open(io.BytesIO(read(res))) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (100, 75)))
+
+    def test_variant_cached(self):
+        """ Test repeat requests are served without decoding again """
+        self.client.get(image_url(self.business.id), {'width': 100}).close()
+
+        with patch.object(views, 'render_variant') as render_variant:
+            res = self.client.get(image_url(self.business.id), {'width': 100})
+            read(res)
+
+        render_variant.assert_not_called()
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+
+    def test_not_modified(self):
+        """ Test a matching If-None-Match is answered with 304 """
+        res = self.client.get(image_url(self.business.id), {'width': 100})
+        res.close()
+
+        res = self.client.get(
+            image_url(self.business.id), {'width': 100},
+            HTTP_IF_NONE_MATCH=res['ETag']
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_versioned_request_long_lived(self):
+        """ Test requests naming the image version may be cached long """
+        version = image_version(self.business.image)
+        res = self.client.get(
+            image_url(self.business.id), {'width': 100, 'v': version}
+        )
+        res.close()
+
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+        self.assertIn('immutable', res['Cache-Control'])
+
+        res = self.client.get(reverse(
+            'business:business-detail', args=[self.business.id]
+        ))
+        self.assertEqual(res.data['image_version'], version)
+
+    def test_invalid_variant_rejected(self):
+        """ Test widths and formats outside the whitelist are rejected """
+        for params in ({'width': 150}, {'width': 'x'},
+                       {'width': 100, 'format': 'png'}):
+            res = self.client.get(image_url(self.business.id), params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_missing_image(self):
+        """ Test a business without an image answers 404 """
+        business = Business.objects.create(user=self.user, title='empty')
+        res = self.client.get(image_url(business.id), {'width': 100})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_users_image_hidden(self):
+        """ Test images of other users' businesses are not served """
+        other = get_user_model().objects.create_user(
+            'other@email.com',
+            'Password123'
+        )
+        self.client.force_authenticate(other)
+        res = self.client.get(image_url(self.business.id), {'width': 100})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class VariantCacheTests(TestCase):
+    """ Test the bounded disk cache of image variants """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def test_concurrent_misses_build_once(self):
+        """ Test simultaneous requests for one key share a single build """
+        cache = VariantCache(self.directory, 1024)
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.05)
+            return b'data'
+
+        def fetch():
+            with cache.open('abcd', build) as f:
+                self.assertEqual(f.read(), b'data')
+
+        threads = [threading.Thread(target=fetch) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(cache._locks, {})
+
+    def test_least_recently_used_evicted(self):
+        """ Test the oldest untouched entries go once over the budget """
+        cache = VariantCache(self.directory, 350)
+        for index, key in enumerate(('aa1', 'bb2', 'cc3')):
+            cache.open(key, lambda: b'x' * 100).close()
+            os.utime(cache.path(key), (index, index))
+        # Reading refreshes 'aa1', leaving 'bb2' the least recently used
+        cache.open('aa1', lambda: b'').close()
+        cache.open('dd4', lambda: b'x' * 100).close()
+
+        remaining = sorted(
+            key for key in ('aa1', 'bb2', 'cc3', 'dd4')
+            if os.path.exists(cache.path(key))
+        )
+        self.assertEqual(remaining, ['aa1', 'cc3', 'dd4'])
+
+    def test_failed_build_leaves_nothing(self):
+        """ Test a build error writes no file and releases the lock """
+        cache = VariantCache(self.directory, 1024)
+
+        def build():
+            raise OSError('broken image')
+
+        with self.assertRaises(OSError):
+            cache.open('abcd', build)
+        self.assertFalse(os.path.exists(cache.path('abcd')))
+        self.assertEqual(cache._locks, {})
@@ -0,0 +1,166 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Business
+from business.media import parse_range
+
+DATA = bytes(range(256)) * 4
+
+
+def media_url(name):
+    return reverse('media', args=[name])
+
+
+def read(response):
+    content = b''.join(response.streaming_content)
+    response.close()
+    return content
+
+
+class MediaApiTests(TestCase):
+    """ Test uploaded media is served to its owners only """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.business = Business.objects.create(user=self.user, title='shop')
+        self.business.image.save('photo.jpg', ContentFile(DATA))
+        self.name = self.business.image.name
+
+    def test_owner_gets_file(self):
+        """ Test the whole file is served with validators """
+        res = self.client.get(media_url(self.name), HTTP_ACCEPT='image/*')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(read(res), DATA)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(DATA)))
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+    def test_not_modified(self):
+        """ Test a matching If-None-Match is answered with 304 """
+        res = self.client.get(media_url(self.name))
+        res.close()
+
+        res = self.client.get(
+            media_url(self.name), HTTP_IF_NONE_MATCH=res['ETag']
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_byte_range(self):
+        """ Test a single range is answered with 206 and only its bytes """
+        res = self.client.get(media_url(self.name), HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(read(res), DATA[10:20])
+        self.assertEqual(res['Content-Range'], f'bytes 10-19/{len(DATA)}')
+        self.assertEqual(res['Content-Length'], '10')
+
+    def test_stale_if_range_gets_whole_file(self):
+        """ Test a range for an older version of the file is ignored """
+        res = self.client.get(
+            media_url(self.name), HTTP_RANGE='bytes=10-19',
+            HTTP_IF_RANGE='"stale"'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(read(res), DATA)
+
+    def test_unsatisfiable_range(self):
+        """ Test a range past the end of the file is answered with 416 """
+        res = self.client.get(media_url(self.name), HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(res['Content-Range'], f'bytes */{len(DATA)}')
+
+    def test_other_users_file_hidden(self):
+        """ Test files of other users' businesses are not served """
+        other = get_user_model().objects.create_user(
+            'other@email.com',
+            'Password123'
+        )
+        self.client.force_authenticate(other)
+        res = self.client.get(media_url(self.name))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_login_required(self):
+        """ Test anonymous requests are refused """
+        res = APIClient().get(media_url(self.name))
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_traversal_rejected(self):
+        """ Test paths leaving the media root are not served """
+        res = self.client.get(media_url(f'uploads/../{self.name}'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_shared_blob_served_to_each_owner(self):
+        """ Test a file used by several users' businesses serves them all """
+        other = get_user_model().objects.create_user(
+            'other@email.com',
+            'Password123'
+        )
+        Business.objects.create(user=other, title='copy', image=self.name)
+        self.client.force_authenticate(other)
+
+        res = self.client.get(media_url(self.name))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res.close()
+
+    @override_settings(MEDIA_SERVING={'SENDFILE': 'x-accel-redirect'})
+    def test_accel_redirect(self):
+        """ Test the transfer is handed to nginx when configured """
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Accel-Redirect'],
+                         f'/protected-media/{self.name}')
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_SERVING={'SENDFILE': 'x-sendfile'})
+    def test_x_sendfile(self):
+        """ Test the transfer is handed to the server by absolute path """
+        res = self.client.get(media_url(self.name))
+        self.assertEqual(res['X-Sendfile'], self.business.image.path)
+
+
+class ParseRangeTests(TestCase):
+    """ Test Range header parsing """
+    def test_ranges(self):
+        """ Test explicit, open ended and suffix ranges """
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=95-200', 100), (95, 99))
+
+    def test_ignored_ranges(self):
+        """ Test headers answered with the whole file """
+        for header in (None, '', 'bytes=0-1,5-6', 'items=0-1', 'bytes=9-1'):
+            self.assertIsNone(parse_range(header, 100))
+
+    def test_unsatisfiable(self):
+        """ Test ranges starting past the end raise ValueError """
+        for header in ('bytes=100-', 'bytes=-0'):
+            with self.assertRaises(ValueError):
+                parse_range(header, 100)
@@ -0,0 +1,120 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Business, Tag, Task
+
+
+BUSINESS_URL = reverse('business:business-list')
+TAG_URL = reverse('business:tag-list')
+TASK_URL = reverse('business:task-list')
+
+
+class KeysetPaginationApiTests(TestCase):
+    """ Test cursor pagination of the business api collections """
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _collect(self, url, params):
+        """ Follow next links and return every page's results """
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append(res.data['results'])
+            if not res.data['next']:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_unpaginated_without_params(self):
+        """ Test the collection is a plain list when not requested """
+        Tag.objects.create(user=self.user, name='Sales')
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.data, list)
+
+    def test_business_pages_newest_first(self):
+        """ Test businesses are paged by descending id """
+        for i in range(5):
+            Business.objects.create(user=self.user, title=f'business {i}')
+
+        pages = self._collect(BUSINESS_URL, {'page_size': 2})
+        ids = [row['id'] for page in pages for row in page]
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        expected = Business.objects.order_by('-id').values_list(
+            'id', flat=True
+        )
+        self.assertEqual(ids, list(expected))
+
+    def test_tag_pages_ties_broken_by_id(self):
+        """ Test tags with equal names are neither skipped nor repeated """
+        for name in ['Sales', 'Sales', 'Sales', 'Admin', 'Warehouse']:
+            Tag.objects.create(user=self.user, name=name)
+
+        pages = self._collect(TAG_URL, {'page_size': 2})
+        ids = [row['id'] for page in pages for row in page]
+
+        expected = Tag.objects.order_by('-name', 'id').values_list(
+            'id', flat=True
+        )
+        self.assertEqual(ids, list(expected))
+
+    def test_previous_link_returns_prior_page(self):
+        """ Test following the previous link returns the earlier page """
+        for i in range(5):
+            Task.objects.create(user=self.user, name=f'task {i}')
+
+        first = self.client.get(TASK_URL, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_pagination_with_assigned_only(self):
+        """ Test pagination respects the assigned_only filter """
+        business = Business.objects.create(user=self.user, title='sales')
+        for i in range(3):
+            tag = Tag.objects.create(user=self.user, name=f'tag {i}')
+            business.tag.add(tag)
+        Tag.objects.create(user=self.user, name='unassigned')
+
+        pages = self._collect(TAG_URL, {'page_size': 2, 'assigned_only': 1})
+        names = [row['name'] for page in pages for row in page]
+
+        self.assertEqual(names, ['tag 2', 'tag 1', 'tag 0'])
+
+    def test_invalid_cursor(self):
+        """ Test a malformed cursor is rejected """
+        res = self.client.get(BUSINESS_URL, {'cursor': 'not-a-cursor'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_invalid_values(self):
+        """ Test well formed cursors holding unusable values are rejected """
+        Business.objects.create(user=self.user, title='shop')
+        cursors = (
+            (BUSINESS_URL, ['abc']),
+            (BUSINESS_URL, [None]),
+            (BUSINESS_URL, [{'a': 1}]),
+            (BUSINESS_URL, [10 ** 30]),
+            (BUSINESS_URL, [-10 ** 30]),
+            (TAG_URL, ['name', 'abc']),
+            (TAG_URL, [['name'], 1]),
+        )
+        for url, position in cursors:
+            raw = json.dumps({'p': position}).encode('utf-8')
+            cursor = base64.urlsafe_b64encode(raw).decode('ascii')
+            res = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
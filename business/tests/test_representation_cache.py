@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import Business, Tag, Task
+from business.serializers import BusinessDetailSerializer, BusinessSerializer
+
+
+class RepresentationCacheTests(TestCase):
+    """ Test the per-object representation cache of business serializers """
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Sales')
+        self.business = Business.objects.create(user=self.user, title='sales')
+        self.business.tag.add(self.tag)
+
+    def test_warm_list_serialized_without_queries(self):
+        """ Test cached rows skip relation loading and serialization """
+        expected = BusinessSerializer(Business.objects.all(), many=True).data
+        businesses = list(Business.objects.all())
+
+        with self.assertNumQueries(0):
+            data = BusinessSerializer(businesses, many=True).data
+
+        self.assertEqual(data, expected)
+
+    def test_only_misses_serialized(self):
+        """ Test a list mixing cached and new rows loads only the new ones """
+        BusinessSerializer(Business.objects.all(), many=True).data
+        business2 = Business.objects.create(user=self.user, title='warehouse')
+        business2.tag.add(self.tag)
+        businesses = list(Business.objects.order_by('-id'))
+
+        with self.assertNumQueries(2):
+            data = BusinessSerializer(businesses, many=True).data
+
+        self.assertEqual([row['tag'] for row in data], [[self.tag.id]] * 2)
+
+    def test_serializers_cached_separately(self):
+        """ Test list and detail representations do not collide """
+        BusinessSerializer(self.business).data
+        data = BusinessDetailSerializer(self.business).data
+        self.assertEqual(data['tag'], [{'id': self.tag.id, 'name': 'Sales'}])
+
+    def test_save_evicts(self):
+        """ Test saving a business evicts its representation """
+        BusinessSerializer(self.business).data
+        self.business.title = 'warehouse'
+        self.business.save()
+
+        data = BusinessSerializer(Business.objects.get(id=self.business.id)).data
+        self.assertEqual(data['title'], 'warehouse')
+
+    def test_link_change_evicts(self):
+        """ Test adding a link from either side evicts the business """
+        BusinessSerializer(self.business).data
+        task = Task.objects.create(user=self.user, name='invoicing')
+        task.business_set.add(self.business)
+
+        data = BusinessSerializer(Business.objects.get(id=self.business.id)).data
+        self.assertEqual(data['task'], [task.id])
+
+    def test_tag_rename_and_delete_evict_details(self):
+        """ Test renaming or deleting a nested tag evicts the detail """
+        BusinessDetailSerializer(self.business).data
+        self.tag.name = 'Marketing'
+        self.tag.save()
+        data = BusinessDetailSerializer(
+            Business.objects.get(id=self.business.id)
+        ).data
+        self.assertEqual(data['tag'][0]['name'], 'Marketing')
+
+        self.tag.delete()
+        data = BusinessDetailSerializer(
+            Business.objects.get(id=self.business.id)
+        ).data
+        self.assertEqual(data['tag'], [])
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'api.example.com'])
+    def test_urls_cached_per_origin(self):
+        """ Test absolute image URLs are not shared between hosts """
+        self.business.image = 'uploads/business/photo.jpg'
+        self.business.save()
+        factory = APIRequestFactory()
+
+        def image_url(**extra):
+            request = Request(factory.get('/', **extra))
+            return BusinessDetailSerializer(
+                self.business, context={'request': request}
+            ).data['image']
+
+        self.assertTrue(image_url().startswith('http://testserver/'))
+        self.assertTrue(
+            image_url(HTTP_HOST='api.example.com', secure=True)
+            .startswith('https://api.example.com/')
+        )
+        self.assertTrue(image_url().startswith('http://testserver/'))
@@ -0,0 +1,243 @@
+import fcntl
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Business, ImageBlob, UploadSession
+from business.uploads import UploadConflict, append_chunk, session_path
+
+
+def uploads_url(business_id):
+    return reverse('business:business-create-upload', args=[business_id])
+
+
+def upload_url(business_id, session_id):
+    return reverse('business:business-upload', args=[business_id, session_id])
+
+
+def finalize_url(business_id, session_id):
+    return reverse(
+        'business:business-finalize-upload', args=[business_id, session_id]
+    )
+
+
+def image_bytes(size=(300, 200)):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 40).convert('RGB').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class ResumableUploadApiTests(TestCase):
+    """ Test business images uploaded in resumable chunks """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(
+            MEDIA_ROOT=self.media_root,
+            IMAGE_PIPELINE={'EAGER': True},
+            IMAGE_UPLOADS={
+                'DIR': os.path.join(self.media_root, 'partial'),
+                'MAX_BYTES': 1024 * 1024,
+                'BLOCK_SIZE': 1000,
+            }
+        )
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        self.user = get_user_model().objects.create_user(
+            'user@email.com',
+            'Password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.business = Business.objects.create(user=self.user, title='shop')
+        self.data = image_bytes()
+
+    def _start(self, size=None):
+        res = self.client.post(
+            uploads_url(self.business.id),
+            {'filename': 'photo.jpg', 'size': size or len(self.data)}
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def _put(self, session_id, offset, chunk):
+        return self.client.put(
+            upload_url(self.business.id, session_id), chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_chunked_upload(self):
+        """ Test an image sent in chunks is stored and processed """
+        session_id = self._start()
+        half = len(self.data) // 2
+        res = self._put(session_id, 0, self.data[:half])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Upload-Offset'], str(half))
+        self._put(session_id, half, self.data[half:])
+
+        res = self.client.post(finalize_url(self.business.id, session_id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.image_status, Business.IMAGE_READY)
+        self.assertEqual(self.business.image_blob.size, len(self.data))
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.listdir(os.path.join(self.media_root, 'partial')))
+
+    def test_resume_after_interrupted_chunk(self):
+        """ Test a client resumes from the offset the server reports """
+        session_id = self._start()
+        self._put(session_id, 0, self.data[:100])
+        session = UploadSession.objects.get()
+        # Bytes of a chunk that broke off before it was recorded
+        with open(session_path(session), 'ab') as f:
+            f.write(b'garbage')
+
+        res = self.client.get(upload_url(self.business.id, session_id))
+        self.assertEqual(res.data['offset'], 100)
+        self._put(session_id, 100, self.data[100:])
+        res = self.client.post(finalize_url(self.business.id, session_id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            ImageBlob.objects.get().digest,
+            hashlib.sha256(self.data).hexdigest()
+        )
+
+    def test_wrong_offset_conflict(self):
+        """ Test a chunk for another offset is refused with the current """
+        session_id = self._start()
+        self._put(session_id, 0, self.data[:100])
+
+        res = self._put(session_id, 50, self.data[50:150])
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['offset'], 100)
+        self.assertEqual(res['Upload-Offset'], '100')
+
+    def test_chunk_refused_while_another_is_written(self):
+        """ Test a chunk racing another one for the file is not written """
+        session_id = self._start()
+        self._put(session_id, 0, self.data[:100])
+        path = session_path(UploadSession.objects.get())
+
+        with open(path, 'rb') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            res = self._put(session_id, 100, self.data[100:200])
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['offset'], 100)
+        self.assertEqual(os.path.getsize(path), 100)
+
+    def test_offset_checked_again_under_lock(self):
+        """ Test a chunk recorded meanwhile turns a stale offset away """
+        session_id = self._start()
+        session = UploadSession.objects.get()
+        self._put(session_id, 0, self.data[:100])
+
+        with self.assertRaises(UploadConflict):
+            append_chunk(session, 0, io.BytesIO(self.data[:50]))
+
+        self.assertEqual(os.path.getsize(session_path(session)), 100)
+
+    def test_chunk_past_declared_size_rejected(self):
+        """ Test more bytes than declared are refused and not kept """
+        session_id = self._start(size=100)
+
+        res = self._put(session_id, 0, self.data[:150])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(UploadSession.objects.get().received, 0)
+
+    def test_incomplete_upload_not_finalized(self):
+        """ Test finalizing before every byte arrived is refused """
+        session_id = self._start()
+        self._put(session_id, 0, self.data[:100])
+
+        res = self.client.post(finalize_url(self.business.id, session_id))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_damaged_upload_not_finalized(self):
+        """ Test a chunk file shorter than the received bytes is refused """
+        session_id = self._start()
+        self._put(session_id, 0, self.data)
+        with open(session_path(UploadSession.objects.get()), 'r+b') as f:
+            f.truncate(100)
+
+        res = self.client.post(finalize_url(self.business.id, session_id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_invalid_image_rejected_on_finalize(self):
+        """ Test the content is validated once, when finalized """
+        data = b'not an image' * 10
+        session_id = self._start(size=len(data))
+        self._put(session_id, 0, data)
+
+        res = self.client.post(finalize_url(self.business.id, session_id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_size_limit(self):
+        """ Test sessions larger than MAX_BYTES are refused up front """
+        res = self.client.post(
+            uploads_url(self.business.id),
+            {'filename': 'photo.jpg', 'size': 2 * 1024 * 1024}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(IMAGE_UPLOADS={'MAX_SESSIONS': 2})
+    def test_session_limit(self):
+        """ Test a business has at most MAX_SESSIONS uploads open """
+        self._start()
+        session_id = self._start()
+
+        res = self.client.post(
+            uploads_url(self.business.id),
+            {'filename': 'photo.jpg', 'size': len(self.data)}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.delete(upload_url(self.business.id, session_id))
+        self._start()
+
+    def test_abort(self):
+        """ Test deleting a session discards its chunks """
+        session_id = self._start()
+        self._put(session_id, 0, self.data[:100])
+        path = session_path(UploadSession.objects.get())
+
+        res = self.client.delete(upload_url(self.business.id, session_id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(path))
+
+    def test_other_users_session_hidden(self):
+        """ Test sessions of other users' businesses are not reachable """
+        session_id = self._start()
+        other = get_user_model().objects.create_user(
+            'other@email.com',
+            'Password123'
+        )
+        self.client.force_authenticate(other)
+
+        res = self._put(session_id, 0, self.data[:100])
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -79,6 +79,30 @@ class PrivateTagApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_bulk_create_tags(self):
+        """ Test creating many tags with one request """
+        payload = [{'name': f'tag {i}'} for i in range(3)]
+        res = self.client.post(TAG_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        self.assertTrue(all(item['id'] for item in res.data))
+        tags = Tag.objects.filter(user=self.user)
+        self.assertEqual(
+            sorted(tags.values_list('name', flat=True)),
+            ['tag 0', 'tag 1', 'tag 2']
+        )
+
+    def test_bulk_create_tags_reports_item_errors(self):
+        """ Test an invalid item is reported and nothing is created """
+        payload = [{'name': 'Sales'}, {'name': ''}]
+        res = self.client.post(TAG_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('name', res.data[1])
+        self.assertFalse(Tag.objects.exists())
+
     def test_retrieve_tags_assigned_to_business(self):
         """ Test filtering tags by those assigned to busienss """
         tag1 = Tag.objects.create(user=self.user, name='order management')
@@ -113,4 +137,39 @@ class PrivateTagApiTests(TestCase):
         business2.tag.add(tag1)
 
         res = self.client.get(TAG_URL, {'assigned_only': 1})
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data), 1)
+
+    def test_filter_tags_by_min_usage(self):
+        """ Test filtering tags used by at least N businesses """
+        tag1 = Tag.objects.create(user=self.user, name='order management')
+        tag2 = Tag.objects.create(user=self.user, name='sales')
+        Tag.objects.create(user=self.user, name='warehouse')
+        for title in ('sales', 'order management'):
+            business = Business.objects.create(title=title, user=self.user)
+            business.tag.add(tag1)
+        business.tag.add(tag2)
+
+        res = self.client.get(TAG_URL, {'min_usage': 2})
+        self.assertEqual(res.data, [TagSerializer(tag1).data])
+
+        res = self.client.get(TAG_URL, {'min_usage': 1})
+        self.assertEqual(
+            res.data,
+            TagSerializer([tag2, tag1], many=True).data
+        )
+
+    def test_filter_tags_invalid_assigned_only(self):
+        """ Test a non numeric assigned_only is rejected """
+        res = self.client.get(TAG_URL, {'assigned_only': 'x'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_tags_invalid_min_usage(self):
+        """ Test a non numeric min_usage is rejected """
+        res = self.client.get(TAG_URL, {'min_usage': 'many'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_tags_out_of_range_min_usage(self):
+        """ Test a min_usage too large for the database is rejected """
+        res = self.client.get(TAG_URL, {'min_usage': 10 ** 30})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_usage', res.data)
@@ -78,6 +78,20 @@ class PrivateTaskApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_bulk_create_tasks(self):
+        """ Test creating many tasks with one request """
+        payload = [{'name': 'finding a new customer'}, {'name': 'invoicing'}]
+        res = self.client.post(TASK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 2)
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_tasks_empty(self):
+        """ Test an empty list is rejected """
+        res = self.client.post(TASK_URL, [], format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_retrieve_tasks_assigned_to_business(self):
         """ Test filtering tasks by those assigned to busienss """
         task1 = Task.objects.create(user=self.user, name='finding a new customer')
@@ -0,0 +1,153 @@
+import fcntl
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from django.utils import timezone
+
+from api.models import UploadSession
+
+
+class UploadConflict(Exception):
+    """ A chunk is not at the session's offset or another is being written """
+
+
+class HashingUploadHandlerMixin:
+    """
+    Compute the SHA-256 of an uploaded file while it streams in and
+    expose it as `content_digest` on the resulting file object
+    """
+    def new_file(self, *args, **kwargs):
+        # Set up before super(), which may stop the handler chain
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            # This handler consumed the chunk
+            self.hasher.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_digest = self.hasher.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin,
+                                     MemoryFileUploadHandler):
+    """ Keep small uploads in memory, hashing them as they arrive """
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin,
+                                        TemporaryFileUploadHandler):
+    """ Stream large uploads to a temporary file, hashing them """
+
+
+def use_hashing_upload_handlers(request):
+    """ Make a request hash its uploads; call before reading request.data """
+    request.upload_handlers = [
+        HashingMemoryFileUploadHandler(request),
+        HashingTemporaryFileUploadHandler(request),
+    ]
+
+
+def file_digest(file):
+    """ Return the SHA-256 of an uploaded file, hashing it if needed """
+    digest = getattr(file, 'content_digest', None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in file.chunks():
+            hasher.update(chunk)
+        file.seek(0)
+        digest = hasher.hexdigest()
+    return digest
+
+
+def upload_options():
+    """ Return IMAGE_UPLOADS merged over the defaults """
+    options = {
+        'DIR': os.path.join(settings.MEDIA_ROOT, 'partial'),
+        'MAX_BYTES': 50 * 1024 * 1024,
+        'BLOCK_SIZE': 64 * 1024,
+        'MAX_AGE': 60 * 60 * 24,
+        'MAX_SESSIONS': 5,
+    }
+    options.update(getattr(settings, 'IMAGE_UPLOADS', {}))
+    return options
+
+
+def session_path(session):
+    """ Return the path the chunks of an upload session are written to """
+    return os.path.join(upload_options()['DIR'], f'{session.pk}.part')
+
+
+def lock_session_file(f):
+    """
+    Lock an open chunk file until it is closed. Raises UploadConflict if
+    another request holds the lock.
+    """
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise UploadConflict
+
+
+def append_chunk(session, offset, stream, length=None):
+    """
+    Write the body of a chunk request to the session's file at offset,
+    block by block, record the new offset on the session and return it.
+    Bytes past the recorded offset, left by an interrupted chunk, are
+    overwritten. The file stays locked from the offset check until the
+    new offset is saved, so concurrent chunks never interleave.
+
+    Raises UploadConflict when another chunk is being written or offset
+    is not the session's, and ValueError when the chunk would run past
+    the declared size.
+    """
+    options = upload_options()
+    remaining = session.size - offset
+    if length is not None and length > remaining:
+        raise ValueError('Chunk runs past the declared size.')
+
+    path = session_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, 'r+b') as f:
+        lock_session_file(f)
+        session.refresh_from_db(fields=['received'])
+        if offset != session.received:
+            raise UploadConflict
+        if f.seek(0, os.SEEK_END) < offset:
+            raise ValueError('Received chunks are missing; start again.')
+        f.truncate(offset)
+        f.seek(offset)
+        while True:
+            block = stream.read(options['BLOCK_SIZE'])
+            if not block:
+                break
+            if len(block) > remaining:
+                f.truncate(offset)
+                raise ValueError('Chunk runs past the declared size.')
+            f.write(block)
+            remaining -= len(block)
+
+        session.received = f.tell()
+        UploadSession.objects.filter(pk=session.pk).update(
+            received=session.received, updated_at=timezone.now()
+        )
+        return session.received
+
+
+def discard_session_file(session):
+    """ Delete the chunks received for a session, if any """
+    try:
+        os.remove(session_path(session))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,212 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from PIL import Image, ImageOps
+from rest_framework.negotiation import BaseContentNegotiation
+
+# Pillow format name and content type of each format clients may request
+VARIANT_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+
+def variant_options():
+    """ Return IMAGE_VARIANTS merged over the defaults """
+    options = {
+        'WIDTHS': (160, 320, 640, 1280),
+        'FORMATS': ('jpeg', 'webp'),
+        'CACHE_DIR': os.path.join(settings.MEDIA_ROOT, 'cache', 'variants'),
+        'MAX_BYTES': 256 * 1024 * 1024,
+        'MAX_AGE': 60 * 60 * 24 * 365,
+    }
+    options.update(getattr(settings, 'IMAGE_VARIANTS', {}))
+    return options
+
+
+def image_version(image):
+    """
+    Return a token that changes whenever the image file does; every
+    upload and every processed image gets a new file name
+    """
+    return hashlib.sha1(image.name.encode('utf-8')).hexdigest()[:16]
+
+
+def render_variant(file, width, variant_format):
+    """ Return an upright copy of an image scaled down to width, encoded """
+    with Image.open(file) as img:
+        img.load()
+        img = ImageOps.exif_transpose(img)
+    if img.width > width:
+        height = max(1, round(img.height * width / img.width))
+        img = img.resize((width, height), Image.LANCZOS)
+
+    pillow_format = VARIANT_FORMATS[variant_format][0]
+    if pillow_format == 'JPEG':
+        img = img.convert('RGB')
+    elif img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA')
+    buffer = io.BytesIO()
+    img.save(buffer, format=pillow_format, quality=85)
+    return buffer.getvalue()
+
+
+class VariantCache:
+    """
+    Size bounded disk cache of generated image variants.
+
+    Files are written to a temporary name and renamed into place, so
+    readers never see partial files. A lock per key makes concurrent
+    requests in a process wait for one build instead of decoding the same
+    image repeatedly. Hits refresh the file's mtime and the least recently
+    used files are evicted once the cache grows past max_bytes.
+    """
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+        self._size_lock = threading.Lock()
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def open(self, key, build):
+        """
+        Return the cached file for key opened for reading, calling build
+        for its bytes on a miss. An open file stays readable even if the
+        entry is evicted meanwhile.
+        """
+        path = self.path(key)
+        f = self._open(path)
+        if f is not None:
+            return f
+
+        lock = self._acquire(key)
+        try:
+            # Another request may have built it while this one waited
+            f = self._open(path)
+            if f is not None:
+                return f
+            data = build()
+            self._write(path, data)
+            f = open(path, 'rb')
+        finally:
+            self._release(key, lock)
+        self._account(len(data))
+        return f
+
+    def _open(self, path):
+        """ Open a cached file and mark it recently used, or return None """
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return f
+
+    def _acquire(self, key):
+        with self._locks_lock:
+            lock, waiters = self._locks.get(key, (threading.Lock(), 0))
+            self._locks[key] = (lock, waiters + 1)
+        lock.acquire()
+        return lock
+
+    def _release(self, key, lock):
+        lock.release()
+        with self._locks_lock:
+            lock, waiters = self._locks[key]
+            if waiters == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, waiters - 1)
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _entries(self):
+        """ Return (mtime, size, path) of every cached file """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _account(self, size):
+        """ Track the cache size and evict the oldest files when over """
+        with self._size_lock:
+            if self._size is None:
+                self._size = sum(entry[1] for entry in self._entries())
+            else:
+                self._size += size
+            if self._size <= self.max_bytes:
+                return
+
+            # Other processes share the directory, so re-measure it and
+            # trim to 90% of the budget to avoid evicting on every write
+            entries = sorted(self._entries())
+            total = sum(entry[1] for entry in entries)
+            target = self.max_bytes * 0.9
+            for _, entry_size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= entry_size
+            self._size = total
+
+
+_variant_cache = None
+_variant_cache_lock = threading.Lock()
+
+
+def get_variant_cache():
+    """ Return the process wide variant cache for the configured directory """
+    global _variant_cache
+    options = variant_options()
+    with _variant_cache_lock:
+        if _variant_cache is None or \
+                _variant_cache.directory != options['CACHE_DIR'] or \
+                _variant_cache.max_bytes != options['MAX_BYTES']:
+            _variant_cache = VariantCache(
+                options['CACHE_DIR'], options['MAX_BYTES']
+            )
+        return _variant_cache
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """
+    Always use the view's first renderer. Image responses bypass the
+    renderers; this keeps an image Accept header from causing a 406.
+    """
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
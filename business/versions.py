@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from api.models import Business, Tag, Task
+
+BUSINESS = 'business'
+TAGS = 'tags'
+TASKS = 'tasks'
+
+# Collections whose representation depends on each model. Tags and tasks
+# appear nested in business details, and assigned_only/min_usage on tags
+# and tasks depend on which businesses link to them.
+MODEL_COLLECTIONS = {
+    Tag: (TAGS, BUSINESS),
+    Task: (TASKS, BUSINESS),
+    Business: (BUSINESS, TAGS, TASKS),
+    Business.tag.through: (BUSINESS, TAGS),
+    Business.task.through: (BUSINESS, TASKS),
+}
+
+
+def _version_cache():
+    """
+    Return the cache holding collection versions. It must be shared by
+    every worker, which the business.E001 system check enforces.
+    """
+    options = getattr(settings, 'COLLECTION_VERSION_CACHE', {})
+    return caches[options.get('CACHE_ALIAS', 'default')]
+
+
+def _version_key(collection, user_id):
+    return f'collection-version:{collection}:{user_id}'
+
+
+def get_version(collection, user_id):
+    """
+    Return the version of a user's collection: the time in nanoseconds
+    of its last change, or of the first lookup if none is recorded
+    """
+    cache = _version_cache()
+    key = _version_key(collection, user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key) or time.time_ns()
+    return version
+
+
+def _set_versions(user_id, collections):
+    now = time.time_ns()
+    _version_cache().set_many({
+        _version_key(collection, user_id): now for collection in collections
+    }, None)
+
+
+def bump_versions(user_id, collections):
+    """
+    Mark the given collections of a user as changed. The version is bumped
+    again on commit so that a read racing the open transaction cannot be
+    stored under the final version.
+    """
+    _set_versions(user_id, collections)
+    transaction.on_commit(lambda: _set_versions(user_id, collections))
+
+
+def bump_for_model(model, user_id):
+    """ Mark every collection depending on model as changed for a user """
+    bump_versions(user_id, MODEL_COLLECTIONS[model])
@@ -1,30 +1,106 @@
-from django.db.models import query
+import os
+import posixpath
+
+from django.core.files import File
+from django.db import transaction
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.db.models import Q
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from PIL import Image
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from api.models import Tag, Task, Business
+from api.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+from api.models import Tag, Task, Business, UploadSession
+from api.renderers import ORJSONRenderer
 from business import serializers
+from business import versions
+from business.filters import MATCH_ANY, filter_linked, filter_min_usage
+from business.media import serve_media
+from business.export import (
+    NDJSONRenderer,
+    iter_business_graph,
+    ndjson_response,
+)
+from business.fast import AttrFastSerializer, BusinessFastSerializer
+from business.mixins import (
+    BulkCreateMixin,
+    ConditionalGetMixin,
+    FastListMixin,
+)
+from business.pagination import AttrPagination, BusinessPagination
+from business.uploads import (
+    UploadConflict,
+    append_chunk,
+    discard_session_file,
+    lock_session_file,
+    session_path,
+    upload_options,
+    use_hashing_upload_handlers,
+)
+from business.variants import (
+    VARIANT_FORMATS,
+    IgnoreClientContentNegotiation,
+    get_variant_cache,
+    image_version,
+    render_variant,
+    variant_options,
+)
+
+# URL pattern capturing the id of a resumable upload session
+UPLOAD_SESSION = r'(?P<session_id>[0-9a-f-]{36})'
 
 
-class BaseAttrViewSet(viewsets.GenericViewSet,
+class BaseAttrViewSet(ConditionalGetMixin,
+                    FastListMixin,
+                    BulkCreateMixin,
+                    viewsets.GenericViewSet,
                     mixins.ListModelMixin,
                     mixins.CreateModelMixin):
     """ Base viewset for user owned  attributes """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    )
     permission_classes = (IsAuthenticated,)
+    pagination_class = AttrPagination
+    fast_list_serializer = AttrFastSerializer()
+
+    def list(self, request, *args, **kwargs):
+        """ List objects, answering 304 when the collection is unchanged """
+        return self.conditional_response(super().list, request, *args, **kwargs)
 
     def get_queryset(self):
         """ Return objects for the current authenticated user only """
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
-        queryset = self.queryset
+        assigned_only = bool(self._int_param('assigned_only'))
+        min_usage = self._int_param('min_usage')
+        queryset = self.queryset.filter(user=self.request.user)
         if assigned_only:
-            queryset = queryset.filter(business__isnull=False)
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+            min_usage = max(min_usage, 1)
+        queryset = filter_min_usage(queryset, self.business_field, min_usage)
+        return queryset.order_by('-name')
+
+    def _int_param(self, name):
+        """ Return an integer query parameter, 0 when absent """
+        low, high = BaseDatabaseOperations.integer_field_ranges['IntegerField']
+        try:
+            value = int(self.request.query_params.get(name, 0))
+        except ValueError:
+            raise ValidationError({name: 'A valid integer is required.'})
+        # Larger values would overflow in the database
+        if not low <= value <= high:
+            raise ValidationError(
+                {name: f'Ensure this value is between {low} and {high}.'}
+            )
+        return value
 
     def perform_create(self, serializer):
         """ create a new object """
@@ -35,55 +111,170 @@ class TagViewSet(BaseAttrViewSet):
     """ Manage tags in the database """
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    business_field = 'tag'
+    version_collection = versions.TAGS
         
         
 class TaskViewSet(BaseAttrViewSet):
     """ Manage tasks in the database """
     queryset = Task.objects.all()
     serializer_class = serializers.TaskSerializer
+    business_field = 'task'
+    version_collection = versions.TASKS
 
 
-class BusinessViewSet(viewsets.ModelViewSet):
+class BusinessViewSet(ConditionalGetMixin,
+                      FastListMixin,
+                      BulkCreateMixin,
+                      viewsets.ModelViewSet):
     """ Manage business in the database """
     queryset = Business.objects.all()
     serializer_class = serializers.BusinessSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    )
     permission_classes = (IsAuthenticated,)
+    pagination_class = BusinessPagination
+    fast_list_serializer = BusinessFastSerializer()
+    version_collection = versions.BUSINESS
+
+    def list(self, request, *args, **kwargs):
+        """ List businesses, answering 304 when unchanged """
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """ Retrieve a business, answering 304 when unchanged """
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
 
     def _params_to_ints(self, qs):
         """ Convert a list of string IDs to a list of intergers """
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _filter_params(self):
+        """ Return the validated tag/task filter of the request """
+        if self.action == 'search':
+            data = self.request.data
+        else:
+            params = self.request.query_params
+            data = {'match': params.get('match', MATCH_ANY)}
+            for field in ('tag', 'task'):
+                if not params.get(field):
+                    continue
+                try:
+                    data[field] = self._params_to_ints(params[field])
+                except ValueError:
+                    raise ValidationError(
+                        {field: 'A comma separated list of ids is required.'}
+                    )
+        serializer = serializers.BusinessSearchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
     def get_queryset(self):
         """ Retrieve the objects for the authenticated user """
-        tags = self.request.query_params.get('tag')
-        tasks = self.request.query_params.get('task')
-        queryset = self.queryset
-
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tag__id__in=tag_ids)
-        if tasks:
-            task_ids = self._params_to_ints(tasks)
-            queryset = queryset.filter(task__id__in=task_ids)
+        params = self._filter_params()
+        queryset = self.queryset.filter(user=self.request.user)
+        for field in ('tag', 'task'):
+            queryset = filter_linked(
+                queryset, field, params.get(field), params['match']
+            )
 
-        return queryset.filter(user=self.request.user).order_by('-id')
+        # Tag and task relations are loaded in bulk by the serializers,
+        # and only for rows missing from the representation cache.
+        return queryset.order_by('-id')
 
     def get_serializer_class(self):
         """ Return serializer class"""
         if self.action == 'retrieve':
             return serializers.BusinessDetailSerializer
-        elif self.action == 'upload_image':
+        elif self.action == 'create' and isinstance(self.request.data, list):
+            return serializers.BusinessBulkSerializer
+        elif self.action in ('upload_image', 'finalize_upload'):
             return serializers.BusinessImageSerializer
+        elif self.action in ('create_upload', 'upload'):
+            return serializers.UploadSessionSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         """ Create a new business """
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False)
+    def search(self, request):
+        """ List businesses filtered by tag/task ids sent in the body """
+        return super().list(request)
+
+    @action(methods=['GET'], detail=False,
+            renderer_classes=(NDJSONRenderer, ORJSONRenderer))
+    def export(self, request):
+        """ Stream the user's tags, tasks and businesses as NDJSON """
+        stream = iter_business_graph(request.user, self.get_queryset())
+        return ndjson_response(request, stream, 'businesses.ndjson')
+
+    @action(methods=['GET'], detail=True,
+            content_negotiation_class=IgnoreClientContentNegotiation)
+    def image(self, request, pk=None):
+        """
+        Serve the business image resized to a whitelisted width and
+        format, e.g. ?width=320&format=webp. Requests carrying the
+        business' image_version as ?v= may be cached for MAX_AGE; others
+        are revalidated against the ETag.
+        """
+        business = self.get_object()
+        if not business.image:
+            raise NotFound('Business has no image.')
+
+        options = variant_options()
+        params = request.query_params
+        errors = {}
+        try:
+            width = int(params.get('width', ''))
+        except ValueError:
+            width = None
+        if width not in options['WIDTHS']:
+            errors['width'] = f'Choose one of {list(options["WIDTHS"])}.'
+        variant_format = params.get('format', 'jpeg')
+        if variant_format not in options['FORMATS']:
+            errors['format'] = f'Choose one of {list(options["FORMATS"])}.'
+        if errors:
+            raise ValidationError(errors)
+
+        version = image_version(business.image)
+        key = f'{version}-{width}.{variant_format}'
+        etag = f'"{key}"'
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            def build():
+                with business.image.open('rb') as f:
+                    return render_variant(f, width, variant_format)
+
+            try:
+                f = get_variant_cache().open(key, build)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                raise NotFound('Business image could not be decoded.')
+            response = FileResponse(
+                f, content_type=VARIANT_FORMATS[variant_format][1]
+            )
+
+        response['ETag'] = etag
+        if params.get('v') == version:
+            response['Cache-Control'] = \
+                f'private, max-age={options["MAX_AGE"]}, immutable'
+        else:
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """ Upload an image to a busienss """
+        """
+        Upload an image to a busienss. The original is stored as sent,
+        once per distinct content, and processed in the background;
+        image_status reports the progress.
+        """
+        use_hashing_upload_handlers(request._request)
         business = self.get_object()
         serializer = self.get_serializer(
             business,
@@ -100,3 +291,163 @@ class BusinessViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(methods=['POST'], detail=True, url_path='uploads')
+    def create_upload(self, request, pk=None):
+        """
+        Start a resumable image upload of a declared size. Chunks are
+        then PUT to the session and the upload finalized once complete.
+        """
+        business = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        max_sessions = upload_options()['MAX_SESSIONS']
+        with transaction.atomic():
+            # Locked so concurrent requests cannot both take the last slot
+            Business.objects.select_for_update().get(pk=business.pk)
+            if business.upload_sessions.count() >= max_sessions:
+                raise ValidationError(
+                    f'At most {max_sessions} uploads may be in progress; '
+                    f'finish or abandon one first.'
+                )
+            session = serializer.save(business=business)
+        return self._upload_response(
+            session, serializer.data, status.HTTP_201_CREATED
+        )
+
+    @action(methods=['GET', 'PUT', 'DELETE'], detail=True,
+            url_path=fr'uploads/{UPLOAD_SESSION}')
+    def upload(self, request, pk=None, session_id=None):
+        """
+        GET returns the offset to resume from. PUT writes the raw request
+        body at the offset sent in the Upload-Offset header, which must
+        match the session's. DELETE abandons the upload.
+        """
+        session = self._get_upload_session(session_id)
+        if request.method == 'DELETE':
+            discard_session_file(session)
+            session.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if request.method == 'PUT':
+            try:
+                offset = int(request.META.get('HTTP_UPLOAD_OFFSET', ''))
+                length = int(request.META.get('CONTENT_LENGTH') or -1)
+            except ValueError:
+                raise ValidationError(
+                    {'Upload-Offset': 'An integer offset is required.'}
+                )
+            if offset != session.received:
+                return self._upload_conflict(session)
+            try:
+                append_chunk(
+                    session, offset, request._request,
+                    length if length >= 0 else None
+                )
+            except UploadConflict:
+                # Another chunk is being written or has just been
+                return self._upload_conflict(session)
+            except UploadSession.DoesNotExist:
+                raise NotFound('Upload session not found.')
+            except ValueError as exc:
+                raise ValidationError(str(exc))
+
+        return self._upload_response(
+            session, self.get_serializer(session).data, status.HTTP_200_OK
+        )
+
+    @action(methods=['POST'], detail=True,
+            url_path=fr'uploads/{UPLOAD_SESSION}/finalize')
+    def finalize_upload(self, request, pk=None, session_id=None):
+        """
+        Validate a completely received upload once and store it as the
+        business image, like upload-image does for a single request
+        """
+        session = self._get_upload_session(session_id)
+        if session.received != session.size:
+            return self._upload_conflict(session)
+
+        try:
+            with open(session_path(session), 'rb') as f:
+                # Held until the image is stored, so no chunk can change it
+                lock_session_file(f)
+                complete = os.fstat(f.fileno()).st_size == session.size
+                if complete:
+                    serializer = self.get_serializer(
+                        session.business,
+                        data={'image': File(f, name=session.filename)}
+                    )
+                    valid = serializer.is_valid()
+                    if valid:
+                        serializer.save()
+        except UploadConflict:
+            return self._upload_conflict(session)
+        except FileNotFoundError:
+            complete = False
+
+        # Neither a stored, an invalid nor a damaged upload is resumed
+        discard_session_file(session)
+        session.delete()
+        if not complete:
+            raise NotFound('Received chunks are missing; start again.')
+        if not valid:
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def _get_upload_session(self, session_id):
+        """ Return the session of the requested business, or raise 404 """
+        business = self.get_object()
+        session = UploadSession.objects.filter(
+            pk=session_id, business=business
+        ).first()
+        if session is None:
+            raise NotFound('Upload session not found.')
+        session.business = business
+        return session
+
+    def _upload_response(self, session, data, status_code):
+        response = Response(data, status=status_code)
+        response['Upload-Offset'] = session.received
+        return response
+
+    def _upload_conflict(self, session):
+        """ Tell the client the offset its next chunk has to start at """
+        return self._upload_response(
+            session,
+            {
+                'detail': 'The upload is at a different offset.',
+                'offset': session.received,
+            },
+            status.HTTP_409_CONFLICT
+        )
+
+
+class MediaView(APIView):
+    """
+    Serve uploaded media. A file is only served to users owning a
+    business whose image or thumbnail it is, so paths are not enough to
+    read other users' images.
+    """
+    authentication_classes = (
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    )
+    permission_classes = (IsAuthenticated,)
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, path):
+        name = posixpath.normpath(path)
+        if name != path or name.startswith('../'):
+            raise NotFound()
+        owned = Business.objects.filter(user=request.user).filter(
+            Q(image=name) | Q(thumbnail=name)
+        )
+        if not owned.exists():
+            raise NotFound()
+        try:
+            return serve_media(request._request, name)
+        except FileNotFoundError:
+            raise NotFound()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 
 # admin: taepark@gmail.com
 # password: Ov3
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'api',
+    'business',
 ]
 
 MIDDLEWARE = [
@@ -87,6 +89,20 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# The local-memory cache is per process. Point 'default' at a shared
+# backend (memcached or redis) to share response caches, group
+# memberships and collection versions between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -130,4 +146,119 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'web/media')
 STATIC_ROOT = os.path.join(BASE_DIR, 'web/static')
 
 AUTH_USER_MODEL = 'api.UserProfile'
-DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
\ No newline at end of file
+
+# Token authentication cache. Set CACHE_ALIAS to a shared cache (e.g.
+# memcached or redis) to share entries between worker processes. Entries
+# held in each process expire after LOCAL_TTL seconds, which bounds how
+# long a revoked token keeps working on other workers.
+AUTH_TOKEN_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 60,
+    'LOCAL_TTL': 5,
+    'CACHE_ALIAS': None,
+}
+
+# Cache holding each user's group names for group based permissions.
+# Entries in a shared cache (memcached, redis) are invalidated on change
+# and expire after TIMEOUT. A per-process cache such as LocMem keeps them
+# for LOCAL_TIMEOUT seconds only, which bounds how long a revoked group
+# keeps granting access on other workers.
+GROUP_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 5,
+    'LOCAL_TIMEOUT': 5,
+}
+
+# Cache holding the per-user collection versions used for ETags
+COLLECTION_VERSION_CACHE = {
+    'CACHE_ALIAS': 'default',
+    # Versions must be shared by every worker; a per-process cache is
+    # only accepted in development
+    'ALLOW_LOCAL': DEBUG,
+}
+
+# Cache of list/detail responses of the business api
+RESPONSE_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 5,
+}
+
+# Cache of serialized businesses, keyed by row version
+REPRESENTATION_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 60,
+}
+
+# Lifetime in seconds of the opt-in signed access and refresh tokens
+SIGNED_TOKEN = {
+    'ACCESS_TTL': 60 * 5,
+    'REFRESH_TTL': 60 * 60 * 24 * 14,
+}
+
+# Rows fetched per database round trip by the streaming NDJSON export
+BUSINESS_EXPORT = {
+    'CHUNK_SIZE': 2000,
+}
+
+# Background processing of uploaded business images. At most MAX_QUEUE
+# jobs wait or run per process; uploads past that, and jobs lost when a
+# process exits, stay pending until process_pending_images runs. EAGER
+# processes uploads inside the request, for tests and debugging.
+IMAGE_PIPELINE = {
+    'WORKERS': 2,
+    'MAX_QUEUE': 100,
+    'EAGER': False,
+    'THUMBNAIL_SIZE': (256, 256),
+}
+
+# Resized business images served on demand from a bounded disk cache
+IMAGE_VARIANTS = {
+    'WIDTHS': (160, 320, 640, 1280),
+    'FORMATS': ('jpeg', 'webp'),
+    'CACHE_DIR': os.path.join(BASE_DIR, 'web/cache/variants'),
+    'MAX_BYTES': 256 * 1024 * 1024,
+    'MAX_AGE': 60 * 60 * 24 * 365,
+}
+
+# Resumable image uploads. Chunks are written to DIR and sessions idle
+# for MAX_AGE seconds are removed by the cleanup_upload_sessions command.
+# A business has at most MAX_SESSIONS uploads in progress.
+IMAGE_UPLOADS = {
+    'DIR': os.path.join(BASE_DIR, 'web/uploads'),
+    'MAX_BYTES': 50 * 1024 * 1024,
+    'BLOCK_SIZE': 64 * 1024,
+    'MAX_AGE': 60 * 60 * 24,
+    'MAX_SESSIONS': 5,
+}
+
+# Uploaded media is served by MediaView to the owners of the businesses
+# using it. Set SENDFILE to 'x-sendfile' or 'x-accel-redirect' to let the
+# front server transfer the file; nginx must map ACCEL_PREFIX to
+# MEDIA_ROOT in an internal location.
+MEDIA_SERVING = {
+    'SENDFILE': None,
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 60 * 60,
+}
+
+# orjson backed JSON is the default; MessagePack is negotiated through
+# Accept/Content-Type when the optional msgpack package is installed
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(
+        1, 'api.renderers.MessagePackRenderer'
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].insert(
+        1, 'api.renderers.MessagePackParser'
+    )
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
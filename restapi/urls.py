@@ -15,10 +15,13 @@ Including another URLconf
 """
 
 from django.urls import path, include
-from django.conf.urls.static import static
 from django.conf import settings
 
+from business.views import MediaView
+
 urlpatterns = [
     path('', include('api.urls')),
-    path('business/', include('business.urls'))
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    path('business/', include('business.urls')),
+    path(f'{settings.MEDIA_URL.strip("/")}/<path:path>', MediaView.as_view(),
+         name='media'),
+]